@@ -0,0 +1,68 @@
+"""
+Measures the startup import time of the data layer and the cost of building Component
+records from database rows, without touching the image, decoding the original photo and
+reading the pre-rendered thumbnail.
+
+Run from the repository root:
+    python -m benchmarks.bench_datalayer [rows]
+"""
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from PIL import Image
+
+from src import images
+from src.component import Component
+
+
+MODULES = ["src.models", "src.database", "src.component"]
+
+
+def importTime(module: str) -> tuple[float, bool]:
+    # A fresh interpreter, so nothing is imported yet
+    output = subprocess.run(
+        [sys.executable, "-c",
+         "import sys, time\n"
+         "start = time.perf_counter()\n"
+         f"import {module}\n"
+         "print(time.perf_counter() - start)\n"
+         "print(any(name.split('.')[0] in ('PIL', 'tkinter', 'customtkinter') for name in sys.modules))"],
+        capture_output=True, text=True, check=True
+    ).stdout.split()
+    return float(output[0]), output[1] == "True"
+
+
+def construct(rows: list[dict], touchImage: bool) -> float:
+    start = perf_counter()
+    for row in rows:
+        component = Component(**row)
+        if touchImage:
+            # Every row pays the decode, not only the first one of a path
+            images.imageCache.clear()
+            component.image
+    return (perf_counter() - start) / len(rows) * 1e6
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    for module in MODULES:
+        elapsed, gui = importTime(module)
+        print(f"import {module}: {elapsed * 1000:.1f} ms, Pillow or GUI loaded: {gui}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        imagePath = Path(directory) / "part.jpg"
+        Image.effect_noise((4000, 3000), 64).convert("RGB").save(imagePath, quality=90)
+        rows = [{"name": f"Part {i}", "description": "", "price": i % 100, "imagePath": str(imagePath)} for i in range(size)]
+        print(f"Component from row: {construct(rows, False):.2f} µs")
+        print(f"With the 4000x3000 original decoded: {construct(rows[:50], True):.0f} µs")
+        images.useThumbnailCache(Path(directory) / "thumbnails")
+        construct(rows[:1], True)
+        print(f"With the cached thumbnail read: {construct(rows, True):.0f} µs")
+        images.useThumbnailCache(None)
+
+
+if __name__ == "__main__":
+    main()
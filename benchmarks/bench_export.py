@@ -0,0 +1,57 @@
+"""
+Measures the time and peak memory of streaming a large stock table to a gzipped CSV file.
+
+Run from the repository root:
+    python -m benchmarks.bench_export [stock rows]
+"""
+import resource
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from src.database import Database
+from src.exporter import exportStock
+
+
+def peakRss() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    locations = 100
+    with tempfile.TemporaryDirectory() as directory:
+        # The safe profile has no memory map, whose file pages would count as resident memory
+        db = Database(f"sqlite:///{Path(directory) / 'export.db'}", profile="safe")
+        db.connect()
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql(
+                "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+                "INSERT INTO components (name, description, price) SELECT 'Part ' || i, '', i % 100 FROM n",
+                (size // locations + 1,)
+            )
+            conn.exec_driver_sql(
+                "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+                "INSERT INTO locations (\"parentID\", name, \"shortName\", description) SELECT -1, 'Box ' || i, '', '' FROM n",
+                (locations,)
+            )
+            conn.exec_driver_sql(
+                "WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < ? - 1) "
+                "INSERT INTO componentlocationmap (\"componentID\", \"locationID\", amount) "
+                "SELECT i / ? + 1, i % ? + 1, i % 50 + 1 FROM n",
+                (size, locations, locations)
+            )
+
+        before = peakRss()
+        start = perf_counter()
+        count = exportStock(db, Path(directory) / "stock.csv.gz")
+        elapsed = perf_counter() - start
+        print(f"Exported {count} stock rows in {elapsed:.2f} s")
+        print(f"Peak RSS before {before:.1f} MiB, after {peakRss():.1f} MiB")
+        db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Compares write and read throughput of the SQLite performance profiles.
+
+Run from the repository root:
+    python -m benchmarks.bench_profiles [components]
+"""
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from src.component import Component
+from src.database import Database
+from src.location import Location
+from src.profiles import PROFILES
+
+
+def runProfile(profile: str, directory: Path, size: int) -> tuple[float, float, float]:
+    db = Database(f"sqlite:///{directory / f'{profile}.db'}", profile=profile)
+    db.connect()
+    db.createLocations([Location(f"Box {i}", shortName=f"B{i}") for i in range(10)])
+
+    # One transaction per write, like the GUI does
+    start = perf_counter()
+    for i in range(size):
+        db.createComponent(Component(f"Part {i}", price=0.1))
+    writes = size / (perf_counter() - start)
+
+    start = perf_counter()
+    for i in range(size):
+        db.adjustStock(1 + i, 1 + i % 10, 5)
+    stockWrites = size / (perf_counter() - start)
+
+    start = perf_counter()
+    rounds = 5
+    for _ in range(rounds):
+        db.getComponents()
+    reads = rounds * size / (perf_counter() - start)
+    db.engine.dispose()
+    return writes, stockWrites, reads
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    print(f"Synthetic inventory of {size} components in 10 locations")
+    print(f"{'profile':<10}{'creates/s':>12}{'stock/s':>12}{'rows read/s':>14}")
+    with tempfile.TemporaryDirectory() as directory:
+        for profile in PROFILES:
+            writes, stockWrites, reads = runProfile(profile, Path(directory), size)
+            print(f"{profile:<10}{writes:>12.0f}{stockWrites:>12.0f}{reads:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
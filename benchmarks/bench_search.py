@@ -0,0 +1,49 @@
+"""
+Measures full-text search latency on a synthetic inventory.
+
+Run from the repository root:
+    python -m benchmarks.bench_search [components]
+"""
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from src.component import Component
+from src.database import Database
+
+
+KINDS = ["Resistor", "Capacitor", "Inductor", "Diode", "Transistor", "Connector", "Crystal", "Fuse"]
+PACKAGES = ["0402", "0603", "0805", "1206", "SOT23", "TO220", "DIP8", "SOIC8"]
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.TemporaryDirectory() as directory:
+        db = Database(f"sqlite:///{Path(directory) / 'search.db'}", profile="fast")
+        db.connect()
+        components = (
+            Component(f"{KINDS[i % 8]} {i} {PACKAGES[i // 8 % 8]}", description=f"Batch {i % 97} tolerance {i % 5}%")
+            for i in range(size)
+        )
+        batch: list[Component] = []
+        for component in components:
+            batch.append(component)
+            if len(batch) == 5000:
+                db.createComponents(batch)
+                batch.clear()
+        db.createComponents(batch)
+
+        print(f"Search on {size} components")
+        for query in ("res", "capacitor 0805", "diode sot batch 4", "trans 12"):
+            rounds = 20
+            start = perf_counter()
+            for _ in range(rounds):
+                hits = db.search(query, limit=50)
+            elapsed = (perf_counter() - start) / rounds * 1000
+            print(f"{query!r:<24}{len(hits):>4} hits {elapsed:>8.2f} ms")
+        db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
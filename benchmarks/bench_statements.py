@@ -0,0 +1,51 @@
+"""
+Measures the per-call overhead of point lookups with statements built on every call
+compared to the prebuilt statements used by the Database getters.
+
+Run from the repository root:
+    python -m benchmarks.bench_statements [lookups]
+"""
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from sqlmodel import Session, select
+
+from src.component import Component
+from src.database import STATEMENTS, Database
+from src.location import Location
+from src.models import Components
+
+
+def timeLookups(lookups: int, func) -> float:
+    start = perf_counter()
+    for i in range(lookups):
+        func(i % 1000 + 1)
+    return (perf_counter() - start) / lookups * 1e6
+
+
+def main() -> None:
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.TemporaryDirectory() as directory:
+        db = Database(f"sqlite:///{Path(directory) / 'statements.db'}", profile="fast")
+        db.connect()
+        db.createComponents(Component(f"Part {i}", price=i / 100) for i in range(1000))
+        db.createLocations(Location(f"Box {i}") for i in range(10))
+        db.setStock((i + 1, i % 10 + 1, i + 1) for i in range(1000))
+
+        print(f"{lookups} point lookups by ID, microseconds per call")
+        with Session(db.engine) as session:
+            built = timeLookups(lookups, lambda id: session.exec(select(Components).where(Components.id == id)).first())
+            prebuilt = timeLookups(lookups, lambda id: session.exec(STATEMENTS["componentById"], params={"id": id}).first())  # type: ignore
+        print(f"{'select built per call':<32}{built:>8.1f}")
+        print(f"{'prebuilt statement':<32}{prebuilt:>8.1f}")
+        print(f"{'getComponent':<32}{timeLookups(lookups, lambda id: db.getComponent(id=id)):>8.1f}")
+        print(f"{'getLocation':<32}{timeLookups(lookups, lambda id: db.getLocation(id=id % 10 + 1)):>8.1f}")
+        print(f"{'getComponentLocationMap':<32}{timeLookups(lookups, lambda id: db.getComponentLocationMap(id, (id - 1) % 10 + 1)):>8.1f}")
+        print(f"{'getLocationsIdForComponent':<32}{timeLookups(lookups, db.getLocationsIdForComponent):>8.1f}")
+        db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
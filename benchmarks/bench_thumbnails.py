@@ -0,0 +1,61 @@
+"""
+Compares rendering the thumbnails of a directory of photos one after another, as the
+list did on the UI thread, with rendering them in a thread pool and in a process pool.
+
+Run from the repository root:
+    python -m benchmarks.bench_thumbnails [photos] [workers]
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from PIL import Image, ImageDraw
+
+from src.images import ThumbnailCache
+
+
+def createPhotos(directory: Path, count: int) -> list[Path]:
+    base = Image.effect_noise((1600, 1200), 48).convert("RGB")
+    paths = []
+    for i in range(count):
+        photo = base.copy()
+        # A distinct mark per photo, so every file has its own hash
+        ImageDraw.Draw(photo).rectangle((i % 40 * 40, i // 40 % 30 * 40, i % 40 * 40 + 39, i // 40 % 30 * 40 + 39), fill=(i % 256, 80, 160))
+        paths.append(directory / f"photo{i}.jpg")
+        photo.save(paths[-1], quality=85)
+    return paths
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as directory:
+        photos = createPhotos(Path(directory), count)
+        print(f"{count} photos of 1600x1200, {workers} workers on {os.cpu_count()} CPUs")
+
+        cache = ThumbnailCache(Path(directory) / "serial")
+        start = perf_counter()
+        for photo in photos:
+            cache.render(photo)
+        serial = perf_counter() - start
+        print(f"Serial: {serial:.2f} s")
+
+        for name, processes in (("Threads", False), ("Processes", True)):
+            cache = ThumbnailCache(Path(directory) / name.lower())
+            start = perf_counter()
+            first = None
+            for _ in cache.renderMany(photos, workers=workers, processes=processes):
+                first = first or perf_counter() - start
+            elapsed = perf_counter() - start
+            print(f"{name}: {elapsed:.2f} s, {serial / elapsed:.2f}x, first thumbnail after {first * 1000:.0f} ms")
+
+        start = perf_counter()
+        for _ in ThumbnailCache(Path(directory) / "threads").renderMany(photos, workers=workers):
+            pass
+        print(f"Next start with every thumbnail cached: {(perf_counter() - start) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import queue
+import threading
 import traceback
 from logging import getLogger
 from pathlib import Path
@@ -7,11 +9,16 @@ import tkinter.messagebox as tkMessageBox
 from PIL import Image, ImageOps
 
 from src import widgets
-from src.database import Database
+from src.blobs import useBlobStore
+from src.client import openDatabase
+from src.config import loadConfig
+from src.events import ChangeEvent
+from src.images import useThumbnailCache
+from src.worker import POLL_INTERVAL, DatabaseWorker
 
 from src.component import Component
 from src.location import Location
-from typing import Generator
+from typing import Callable, Generator
 
 
 logger = getLogger(__name__)
@@ -31,12 +38,24 @@ class App(ctk.CTk):
         self.docsPath.mkdir(exist_ok=True)
         self.imgPath = self.dataPath / Path("img")
         self.imgPath.mkdir(exist_ok=True)
+        self.thumbnails = useThumbnailCache(self.dataPath / Path("thumbnails"))
+        self.blobs = useBlobStore(self.dataPath / Path("blobs"))
         self.preMadePath = Path.cwd() / Path("src/img")
         if not self.preMadePath.exists():
             raise FileNotFoundError("Pre-made image path does not exist")
         # Create the database
-        self.db = Database()
+        self.config = loadConfig()
+        self.db = openDatabase(self.config)
         self.db.connect()
+        self.worker = DatabaseWorker(self.db)
+        # Change events can be published on any thread, they are handled on the main loop
+        self.changes: queue.Queue[ChangeEvent] = queue.Queue()
+        self.db.events.subscribe(self.changes.put)
+        # Paths of thumbnails rendered in the background, with the done and total images
+        self.thumbnailResults: queue.Queue[str] = queue.Queue()
+        self.thumbnailProgress = (0, 0)
+        self.thumbnailsDone = threading.Event()
+        self.closing = threading.Event()
         # Load Icons for window
         self.icons = self.loadIcons(self.preMadePath.glob("*.ico"))
         self.windowIcon = str(list(self.preMadePath.glob("window.ico"))[0])
@@ -47,9 +66,17 @@ class App(ctk.CTk):
         self.popup: ctk.CTkToplevel | None = None
         self.locations: dict[int, Location] = {}
         self.components: dict[int, Component] = {}
-        self.refreshData()
-        # Create the widgets
+        # Create the widgets, the data is loaded in the background
         self.createWidgets()
+        self.refreshLocationList()
+        self.after(POLL_INTERVAL, self.processChanges)
+        # Fold old stock movements into monthly snapshots
+        self.worker.submit("compactLedger")
+        # Remove the images and datasheets no component uses anymore
+        self.worker.submit(self.blobs.collectGarbage, self.db)
+        # Render missing thumbnails in the background, the rows show them as they are done
+        threading.Thread(target=self.renderThumbnails, name="thumbnails", daemon=True).start()
+        self.after(POLL_INTERVAL, self.processThumbnails)
 
     def createWidgets(self) -> None:
         self.tabs = ctk.CTkTabview(self)
@@ -87,10 +114,12 @@ class App(ctk.CTk):
         self.searchComponentsVar = ctk.StringVar(value=self.searchComponentsValues[0])
         self.searchComponentsOptionMenu = ctk.CTkOptionMenu(self.partsFrame, values=self.searchComponentsValues, variable=self.searchComponentsVar, command=self.refreshComponentList)
         self.searchComponentsOptionMenu.grid(row=0, column=2, sticky="nw")
+        self.thumbnailLabel = ctk.CTkLabel(self.partsFrame, text="")
+        self.thumbnailLabel.grid(row=0, column=3, sticky="ne", padx=5)
         self.addComponentButton = ctk.CTkButton(self.partsFrame, text="", image=self.icons["plus-circle"], width=28)
         self.addComponentButton.configure(command=lambda: self.createPopup("ac"))
         self.addComponentButton.grid(row=0, column=4, sticky="ne")
-        self.componentList = widgets.ComponentList(self.partsFrame, self.icons, list(self.components.values()), self, self.searchComponentsVar.get())
+        self.componentList = widgets.ComponentList(self.partsFrame, self.icons, self, self.searchComponentsVar.get())
         self.componentList.grid(row=1, column=0, columnspan=5, sticky="new")
         # Create Locations tab
         self.locationsFrame = ctk.CTkFrame(self.tabs.tab("Locations"))
@@ -170,10 +199,13 @@ class App(ctk.CTk):
             self.popup.destroy()
             self.popup = None
 
-    def refreshData(self) -> None:
+    def refreshData(self, callback: Callable[[], None] | None = None) -> None:
+        # Components are loaded page by page by the component list
+        self.worker.run(self, self.db.getLocations, callback=lambda locations: self.setLocations(locations, callback), key="locations")
+
+    def setLocations(self, locations: list[Location], callback: Callable[[], None] | None = None) -> None:
         self.locations.clear()
-        self.components.clear()
-        for location in self.db.getLocations():
+        for location in locations:
             if not location:
                 logger.warning("Location is None")
                 continue
@@ -184,26 +216,96 @@ class App(ctk.CTk):
                 logger.warning(f"Location is invalid: {location.id}-{location.name}")
                 continue
             self.locations[location.id] = location
-
-        for component in self.db.getComponents():
-            if not component:
-                logger.warning("Component is None")
-                continue
-            if not component.id:
-                logger.warning(f"Component is missing in database: {component.name}")
-                continue
-            if component.id < 0:
-                logger.warning(f"Component is invalid: {component.id}-{component.name}")
-                continue
-            self.components[component.id] = component
+        if callback:
+            callback()
 
     def refreshComponentList(self, *args) -> None:
-        self.refreshData()
-        self.componentList.refresh(list(self.components.values()), self.searchComponentsVar.get() ,self.searchComponentsEntry.get())
+        self.componentList.refresh(self.searchComponentsVar.get(), self.searchComponentsEntry.get())
 
     def refreshLocationList(self, *args) -> None:
-        self.refreshData()
-        self.locationList.refresh(list(self.locations.values()), self.searchLocationsVar.get(), self.searchLocationsEntry.get())
+        self.refreshData(lambda: self.locationList.refresh(list(self.locations.values()), self.searchLocationsVar.get(), self.searchLocationsEntry.get()))
+
+    def processChanges(self) -> None:
+        # Collect all pending events, so a batch of changes is loaded with one request
+        componentIDs: set[int] = set()
+        locationIDs: set[int] = set()
+        while True:
+            try:
+                event = self.changes.get_nowait()
+            except queue.Empty:
+                break
+            if event.id is None:
+                continue
+            if event.kind == "component" and event.action == "deleted":
+                componentIDs.discard(event.id)
+                self.componentList.removeComponent(event.id)
+            elif event.kind == "location" and event.action == "deleted":
+                locationIDs.discard(event.id)
+                self.locations.pop(event.id, None)
+                self.locationList.removeLocation(event.id)
+            elif event.kind == "component":
+                componentIDs.add(event.id)
+            elif event.kind == "location":
+                locationIDs.add(event.id)
+            elif event.kind == "stock":
+                componentIDs.add(event.id)
+                if event.locationID is not None:
+                    locationIDs.add(event.locationID)
+        if componentIDs or locationIDs:
+            self.worker.run(self, self.queryChanges, componentIDs, locationIDs, callback=self.applyChanges)
+        self.after(POLL_INTERVAL, self.processChanges)
+
+    def renderThumbnails(self) -> None:
+        # Runs on its own thread, no Tk calls here
+        self.thumbnails.evict()
+        # Queried on this thread, the database worker stays free for the lists
+        paths = self.db.getImagePaths()
+        results = self.thumbnails.renderMany(paths, progress=lambda done, total: setattr(self, "thumbnailProgress", (done, total)))
+        try:
+            for path, digest in results:
+                if self.closing.is_set():
+                    break
+                if digest is not None:
+                    self.thumbnailResults.put(path)
+        finally:
+            results.close()
+            self.thumbnailsDone.set()
+
+    def processThumbnails(self) -> None:
+        paths: set[str] = set()
+        while True:
+            try:
+                paths.add(self.thumbnailResults.get_nowait())
+            except queue.Empty:
+                break
+        if paths:
+            self.componentList.showThumbnails(paths)
+        done, total = self.thumbnailProgress
+        self.thumbnailLabel.configure(text=f"Rendering thumbnails {done}/{total}" if done < total else "")
+        if not self.thumbnailsDone.is_set() or not self.thumbnailResults.empty():
+            self.after(POLL_INTERVAL, self.processThumbnails)
+
+    def queryChanges(self, componentIDs: set[int], locationIDs: set[int]) -> tuple[list, list]:
+        # Runs on the database worker thread, no Tk calls here
+        components = []
+        for componentID, quantity, totalPrice in self.db.getComponentTotals(componentIDs):
+            component = self.db.getComponent(id=componentID)
+            if component:
+                components.append(widgets.ComponentToSort(component, quantity, totalPrice))
+        locations = []
+        for locationID, quantity, totalPrice in self.db.getLocationTotals(locationIDs):
+            location = self.db.getLocation(id=locationID)
+            if location:
+                locations.append(widgets.LocationToSort(location, quantity, totalPrice))
+        return components, locations
+
+    def applyChanges(self, changes: tuple[list, list]) -> None:
+        components, locations = changes
+        for component in components:
+            self.componentList.updateComponent(component)
+        for location in locations:
+            self.locations[location.id] = location
+            self.locationList.updateLocation(location)
 
     def loadIcons(self, paths: Generator[Path, None, None]) -> dict[str, ctk.CTkImage]:
         icons = {}
@@ -215,6 +317,13 @@ class App(ctk.CTk):
             icons[name] = ctk.CTkImage(imageResized)
         return icons
 
+    def destroy(self) -> None:
+        if hasattr(self, "worker"):
+            self.closing.set()
+            self.db.events.unsubscribe(self.changes.put)
+            self.worker.shutdown()
+        super().destroy()
+
     def report_callback_exception(self, *args):
         err = traceback.format_exception(*args)
         strErr = "\n".join(err)
@@ -0,0 +1,204 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import zipfile
+from datetime import datetime
+from logging import getLogger
+from pathlib import Path
+from typing import Callable
+
+from src.blobs import hashFile
+from src.database import Database
+from src.migrations import SCHEMA_VERSION
+
+
+logger = getLogger(__name__)
+
+# Pages copied per backup step, the source is unlocked between steps
+BACKUP_PAGES = 256
+# Seconds to sleep between two backup steps
+BACKUP_SLEEP = 0.005
+
+
+def backupDatabase(db: Database, target: str | Path, pages: int = BACKUP_PAGES, sleep: float = BACKUP_SLEEP,
+                   progress: Callable[[int, int], None] | None = None) -> None:
+    """
+    Copies a live database into a file with SQLite's online backup API.
+
+    The copy is done in steps of a few pages, so readers and writers of the database
+    only wait for a single step and never see a torn copy.
+
+    Args:
+        db (Database): The database to copy.
+        target (str | Path): The file to write the copy to.
+        pages (int): The number of pages copied per step.
+        sleep (float): The seconds to sleep between two steps.
+        progress (Callable[[int, int], None] | None): Called after every step with the remaining and total pages.
+    """
+    source = db.engine.raw_connection()
+    try:
+        with sqlite3.connect(target) as destination:
+            source.driver_connection.backup(  # type: ignore
+                destination, pages=pages, sleep=sleep,
+                progress=(lambda status, remaining, total: progress(remaining, total)) if progress else None
+            )
+        destination.close()
+    finally:
+        source.close()
+
+
+def referencedFiles(path: str | Path) -> list[str]:
+    """
+    Returns the image and datasheet paths stored in a database file.
+    """
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute(
+            "SELECT \"imagePath\" FROM components UNION SELECT \"datasheetPath\" FROM components"
+        ).fetchall()
+    conn.close()
+    return sorted(row[0] for row in rows if row[0] and row[0] != "None")
+
+
+def _blobPath(blobs: Path, digest: str) -> Path:
+    return blobs / digest[:2] / digest
+
+
+def createBackup(db: Database, backupPath: str | Path, progress: Callable[[int, int], None] | None = None) -> Path | None:
+    """
+    Creates a backup of the database and of every image and datasheet it references.
+
+    The archive holds the database copy and a manifest of all files with their SHA-256.
+    The files are stored by their SHA-256 in the blobs folder next to the archives,
+    so a file that didn't change since the last backup isn't copied again.
+
+    Args:
+        db (Database): The database to back up.
+        backupPath (str | Path): The folder of the backups.
+        progress (Callable[[int, int], None] | None): Called with the remaining and total pages of the database copy.
+
+    Returns:
+        Path | None: The path of the archive, None if the backup failed.
+    """
+    backupPath = Path(backupPath)
+    blobs = backupPath / "blobs"
+    blobs.mkdir(parents=True, exist_ok=True)
+    archive = backupPath / f"backup-{datetime.now():%Y%m%d-%H%M%S-%f}.zip"
+    try:
+        with tempfile.TemporaryDirectory(dir=backupPath) as directory:
+            snapshot = Path(directory) / "database.db"
+            backupDatabase(db, snapshot, progress=progress)
+            files: dict[str, str] = {}
+            copied = 0
+            # Take the paths from the snapshot, so files and database match
+            for path in referencedFiles(snapshot):
+                if not Path(path).is_file():
+                    logger.warning(f"File not found: {path}")
+                    continue
+                digest = hashFile(path)
+                files[path] = digest
+                blob = _blobPath(blobs, digest)
+                if blob.exists():
+                    continue
+                blob.parent.mkdir(exist_ok=True)
+                partial = blob.with_suffix(".tmp")
+                shutil.copyfile(path, partial)
+                os.replace(partial, blob)
+                copied += 1
+            manifest = {
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "schemaVersion": SCHEMA_VERSION,
+                "database": hashFile(snapshot),
+                "files": files
+            }
+            partial = archive.with_suffix(".tmp")
+            with zipfile.ZipFile(partial, "w", zipfile.ZIP_DEFLATED) as zf:
+                zf.write(snapshot, "database.db")
+                zf.writestr("manifest.json", json.dumps(manifest, indent=2))
+            os.replace(partial, archive)
+        logger.info(f"Backup \"{archive.name}\" created, {copied} of {len(files)} files copied")
+        return archive
+
+    except (OSError, sqlite3.Error, zipfile.BadZipFile) as e:
+        logger.error(f"Backup failed: {e}")
+        return None
+
+
+def verifyBackup(archive: str | Path) -> bool:
+    """
+    Checks that the database copy and every file of a backup are complete and unchanged.
+
+    Args:
+        archive (str | Path): The backup archive.
+
+    Returns:
+        bool: Whether the backup can be restored.
+    """
+    archive = Path(archive)
+    blobs = archive.parent / "blobs"
+    try:
+        with zipfile.ZipFile(archive) as zf, tempfile.TemporaryDirectory() as directory:
+            manifest = json.loads(zf.read("manifest.json"))
+            snapshot = zf.extract("database.db", directory)
+            if hashFile(snapshot) != manifest["database"]:
+                logger.error(f"Backup \"{archive.name}\": database checksum mismatch")
+                return False
+            with sqlite3.connect(snapshot) as conn:
+                result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+            conn.close()
+            if result != "ok":
+                logger.error(f"Backup \"{archive.name}\": database is corrupt, {result}")
+                return False
+        for path, digest in manifest["files"].items():
+            blob = _blobPath(blobs, digest)
+            if not blob.is_file() or hashFile(blob) != digest:
+                logger.error(f"Backup \"{archive.name}\": file \"{path}\" is missing or corrupt")
+                return False
+        return True
+
+    except (OSError, KeyError, ValueError, sqlite3.Error, zipfile.BadZipFile) as e:
+        logger.error(f"Backup \"{archive.name}\" is unreadable: {e}")
+        return False
+
+
+def restoreBackup(archive: str | Path, target: str | Path, restoreFiles: bool = True) -> bool:
+    """
+    Restores a verified backup into a database file and puts its files back to their paths.
+
+    The database is written with the backup API, so connections that are still open
+    see either the old or the restored database.
+
+    Args:
+        archive (str | Path): The backup archive.
+        target (str | Path): The database file to restore into.
+        restoreFiles (bool): Whether to restore the images and datasheets too.
+
+    Returns:
+        bool: Whether the backup was restored.
+    """
+    archive = Path(archive)
+    if not verifyBackup(archive):
+        return False
+    blobs = archive.parent / "blobs"
+    try:
+        with zipfile.ZipFile(archive) as zf, tempfile.TemporaryDirectory() as directory:
+            manifest = json.loads(zf.read("manifest.json"))
+            snapshot = zf.extract("database.db", directory)
+            Path(target).parent.mkdir(parents=True, exist_ok=True)
+            with sqlite3.connect(snapshot) as source, sqlite3.connect(target) as destination:
+                source.backup(destination, pages=BACKUP_PAGES)
+            source.close()
+            destination.close()
+        if restoreFiles:
+            for path, digest in manifest["files"].items():
+                if Path(path).is_file() and hashFile(path) == digest:
+                    continue
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(_blobPath(blobs, digest), path)
+        logger.info(f"Backup \"{archive.name}\" restored")
+        return True
+
+    except (OSError, sqlite3.Error, zipfile.BadZipFile) as e:
+        logger.error(f"Restore of \"{archive.name}\" failed: {e}")
+        return False
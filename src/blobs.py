@@ -0,0 +1,143 @@
+import hashlib
+import os
+import threading
+import time
+from logging import getLogger
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from src.client import RemoteDatabase
+    from src.database import Database
+
+
+logger = getLogger(__name__)
+
+# Bytes read at once when hashing or copying files
+CHUNK_SIZE = 1024 * 1024
+# Seconds an unreferenced blob is kept, so a file added by an open dialog survives until the component is saved
+GC_GRACE = 24 * 60 * 60
+
+# Set by useBlobStore
+blobStore: "BlobStore | None" = None
+
+
+def hashFile(path: str | Path) -> str:
+    """
+    Returns the SHA-256 hex digest of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BlobStore:
+    """
+    Stores images and datasheets once, named after the SHA-256 of their content.
+
+    A blob is stored as <directory>/<first two hex digits>/<hash><suffix>, so identical
+    files are stored once and files with the same name don't collide. Components reference
+    blobs by path, blobs that no component references are removed by collectGarbage.
+
+    Attributes:
+        directory (Path): The root directory of the blobs.
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def blobPath(self, digest: str, suffix: str = "") -> Path:
+        return self.directory / digest[:2] / f"{digest}{suffix.lower()}"
+
+    def contains(self, path: str | Path) -> bool:
+        """
+        Returns whether a path points into the store.
+        """
+        return Path(path).resolve().parent.parent == self.directory.resolve()
+
+    def add(self, path: str | Path) -> Path:
+        """
+        Copies a file into the store, unless a file with the same content is already stored.
+
+        The file is hashed while it is copied in chunks, it is never held in memory
+        or re-encoded.
+
+        Args:
+            path (str | Path): The file to store.
+
+        Returns:
+            Path: The path of the blob.
+
+        Raises:
+            OSError: If the file can't be read or the blob can't be written.
+        """
+        path = Path(path)
+        if self.contains(path):
+            return path
+        digest = hashlib.sha256()
+        partial = self.directory / f"{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(path, "rb") as source, open(partial, "wb") as target:
+                while chunk := source.read(CHUNK_SIZE):
+                    digest.update(chunk)
+                    target.write(chunk)
+            blob = self.blobPath(digest.hexdigest(), path.suffix)
+            if blob.is_file():
+                logger.debug(f"Blob already stored: {blob.name}")
+            else:
+                blob.parent.mkdir(exist_ok=True)
+                os.replace(partial, blob)
+                logger.info(f"Stored \"{path.name}\" as {blob.name}")
+        finally:
+            partial.unlink(missing_ok=True)
+        return blob
+
+    def references(self, db: "Database | RemoteDatabase") -> dict[Path, int]:
+        """
+        Returns the number of components referencing each stored blob, unreferenced blobs count 0.
+        """
+        counts = {blob: 0 for blob in self.directory.glob("??/*")}
+        for path, count in (db.getFileReferences() or {}).items():
+            blob = Path(path).resolve()
+            if blob in counts:
+                counts[blob] += count
+        return counts
+
+    def collectGarbage(self, db: "Database | RemoteDatabase", grace: float = GC_GRACE) -> int:
+        """
+        Removes the blobs no component references and the leftovers of interrupted copies.
+
+        Args:
+            db (Database | RemoteDatabase): The database whose components reference the blobs.
+            grace (float): The seconds an unreferenced blob is kept after it was added.
+
+        Returns:
+            int: The number of removed files.
+        """
+        references = db.getFileReferences()
+        if references is None:
+            # Without the references every blob would look unused
+            logger.error("File references not available, skipping blob garbage collection")
+            return 0
+        referenced = {Path(path).resolve() for path in references}
+        cutoff = time.time() - grace
+        removed = 0
+        for file in [*self.directory.glob("??/*"), *self.directory.glob("*.tmp")]:
+            if file.resolve() in referenced or file.stat().st_mtime > cutoff:
+                continue
+            file.unlink(missing_ok=True)
+            removed += 1
+        logger.info(f"Removed {removed} unreferenced blobs")
+        return removed
+
+
+def useBlobStore(directory: str | Path | None) -> "BlobStore | None":
+    """
+    Sets the store the dialogs add images and datasheets to, None turns it off.
+    """
+    global blobStore
+    blobStore = BlobStore(directory) if directory is not None else None
+    return blobStore
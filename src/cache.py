@@ -0,0 +1,66 @@
+import threading
+from collections import OrderedDict
+from logging import getLogger
+from typing import Any, Callable, Hashable
+
+
+logger = getLogger(__name__)
+
+
+class LRUCache:
+    """
+    A thread safe, size bounded cache that evicts the least recently used entry.
+
+    Attributes:
+        maxSize (int): The maximal number of entries.
+        hits (int): The number of lookups served from the cache.
+        misses (int): The number of lookups not found in the cache.
+    """
+
+    def __init__(self, maxSize: int = 1024) -> None:
+        if maxSize < 1:
+            raise ValueError("Cache size must be positive")
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxSize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidateWhere(self, predicate: Callable[[Hashable], bool]) -> None:
+        """
+        Removes every entry whose key matches the predicate.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxSize": self.maxSize}
@@ -0,0 +1,202 @@
+"""
+Command line interface for scripts and barcode scanners.
+
+Only the standard library is imported at module level, the database stack is loaded
+by the command that needs it and the GUI stack is never loaded. Every command loads
+SQLAlchemy and SQLModel, which alone take about 0.45-0.65 s, so a command takes well
+over the 100 ms a scanner would like to wait.
+"""
+import argparse
+import logging
+import sys
+from logging import getLogger
+from typing import TYPE_CHECKING
+
+from src.config import loadConfig
+
+if TYPE_CHECKING:
+    from src.client import RemoteDatabase
+    from src.database import Database
+
+
+logger = getLogger(__name__)
+
+TABLES = ["components", "locations", "stock"]
+
+
+class CommandError(Exception):
+    """
+    Raised by a command to stop with an error message and exit code 1.
+    """
+
+
+def openBackend(url: str | None) -> "Database | RemoteDatabase":
+    from src.client import openDatabase
+
+    config = loadConfig()
+    if url:
+        config = {**config, "database": {**config.get("database", {}), "url": url}}
+    db = openDatabase(config)
+    if not db.connect():
+        raise CommandError("Can't connect to the database")
+    return db
+
+
+def resolveComponent(db, value: str) -> int:
+    """
+    Returns the ID of a component given by name, e.g. the text of a scanned barcode, or by ID.
+
+    Names win over IDs, so a numeric barcode finds its component. "#123" always means ID 123.
+    """
+    if value.startswith("#") and value[1:].isdigit():
+        return int(value[1:])
+    component = db.getComponent(name=value)
+    if component is not None and component.id is not None:
+        return component.id
+    if value.isdigit():
+        return int(value)
+    raise CommandError(f"Component \"{value}\" not found")
+
+
+def resolveLocation(db, value: str) -> int:
+    if value.startswith("#") and value[1:].isdigit():
+        return int(value[1:])
+    location = db.getLocation(name=value)
+    if location is not None and location.id is not None:
+        return location.id
+    if value.isdigit():
+        return int(value)
+    raise CommandError(f"Location \"{value}\" not found")
+
+
+def stockAdd(db, args: argparse.Namespace) -> None:
+    componentID, locationID = resolveComponent(db, args.component), resolveLocation(db, args.location)
+    amount = db.adjustStock(componentID, locationID, args.amount)
+    if amount == -1:
+        raise CommandError("Stock not changed")
+    print(amount)
+
+
+def stockRemove(db, args: argparse.Namespace) -> None:
+    componentID, locationID = resolveComponent(db, args.component), resolveLocation(db, args.location)
+    amount = db.adjustStock(componentID, locationID, -args.amount)
+    if amount == -1:
+        raise CommandError("Not enough stock")
+    print(amount)
+
+
+def stockMove(db, args: argparse.Namespace) -> None:
+    componentID = resolveComponent(db, args.component)
+    source, target = resolveLocation(db, args.source), resolveLocation(db, args.target)
+    if not db.moveStock(componentID, source, target, args.amount):
+        raise CommandError("Stock not moved")
+    left, moved = db.getComponentAmountInLocation(componentID, source), db.getComponentAmountInLocation(componentID, target)
+    print(f"{max(left, 0)}\t{max(moved, 0)}")
+
+
+def search(db, args: argparse.Namespace) -> None:
+    for kind, id, name, _ in db.search(args.query, limit=args.limit, kind=args.kind):
+        print(f"{kind}\t{id}\t{name}")
+
+
+def importFile(db, args: argparse.Namespace) -> None:
+    from src import importer
+
+    func = {"components": importer.importComponents, "locations": importer.importLocations, "stock": importer.importStock}[args.table]
+    try:
+        imported, skipped = func(db, args.path)
+    except OSError as e:
+        raise CommandError(f"Can't read \"{args.path}\": {e.strerror or e}") from e
+    except KeyError as e:
+        raise CommandError(f"Missing column {e} in \"{args.path}\"") from e
+    except ValueError as e:
+        raise CommandError(f"Invalid file \"{args.path}\": {e}") from e
+    print(f"{imported} imported, {skipped} skipped")
+
+
+def exportFile(db, args: argparse.Namespace) -> None:
+    if not hasattr(db, "streamRows"):
+        # Rows are streamed from a local cursor, a server can't stream them
+        raise CommandError("Export needs a local database, not a server URL")
+
+    from sqlalchemy.exc import OperationalError
+
+    from src.exporter import exportTable
+
+    columns = args.columns.split(",") if args.columns else None
+    try:
+        print(f"{exportTable(db, args.table, args.path, columns)} exported")
+    except ValueError as e:
+        raise CommandError(str(e)) from e
+    except OSError as e:
+        raise CommandError(f"Can't write \"{args.path}\": {e.strerror or e}") from e
+    except OperationalError as e:
+        raise CommandError(f"Database error: {e.orig}") from e
+
+
+def report(db, args: argparse.Namespace) -> None:
+    quantity, value = db.getInventoryValue()
+    print(f"Total\t{quantity}\t{value:.2f}")
+    names = {location.id: location.name for location in db.getLocations()}
+    totals = db.getSubtreeTotals() if args.subtree else db.getLocationTotals()
+    for locationID, quantity, value in sorted(totals, key=lambda row: names.get(row[0], "")):
+        print(f"{names.get(locationID, locationID)}\t{quantity}\t{value:.2f}")
+
+
+def createParser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="circuitstash", description="Manage the Circuit Stash inventory without the GUI")
+    parser.add_argument("--database", help="Database or server URL, the one from config.json by default")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show log messages")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    stock = commands.add_parser("stock", help="Change the stock of a component").add_subparsers(dest="action", required=True)
+    for name, func, help in (("add", stockAdd, "Add to the stock"), ("remove", stockRemove, "Take from the stock")):
+        command = stock.add_parser(name, help=help)
+        command.add_argument("component", help="Name or ID, #ID for an ID only")
+        command.add_argument("location", help="Name or ID, #ID for an ID only")
+        command.add_argument("amount", type=int)
+        command.set_defaults(func=func)
+    command = stock.add_parser("move", help="Move stock to another location")
+    command.add_argument("component", help="Name or ID, #ID for an ID only")
+    command.add_argument("source", help="Name or ID, #ID for an ID only")
+    command.add_argument("target", help="Name or ID, #ID for an ID only")
+    command.add_argument("amount", type=int)
+    command.set_defaults(func=stockMove)
+
+    command = commands.add_parser("search", help="Search components and locations")
+    command.add_argument("query")
+    command.add_argument("--kind", choices=["component", "location"])
+    command.add_argument("--limit", type=int, default=50)
+    command.set_defaults(func=search)
+
+    command = commands.add_parser("import", help="Import a CSV or JSON Lines file")
+    command.add_argument("table", choices=TABLES)
+    command.add_argument("path")
+    command.set_defaults(func=importFile)
+
+    command = commands.add_parser("export", help="Export to CSV or JSON Lines, add .gz to compress")
+    command.add_argument("table", choices=TABLES)
+    command.add_argument("path")
+    command.add_argument("--columns", help="Comma separated columns, all by default")
+    command.set_defaults(func=exportFile)
+
+    command = commands.add_parser("report", help="Show the quantity and value per location")
+    command.add_argument("--subtree", action="store_true", help="Include the locations inside each location")
+    command.set_defaults(func=report)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = createParser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR, format="%(levelname)s - %(message)s")
+    try:
+        db = openBackend(args.database)
+        args.func(db, args)
+        return 0
+    except CommandError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except OSError as e:
+        # Includes the connection errors of a server
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
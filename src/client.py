@@ -0,0 +1,233 @@
+import http.client
+import json
+import queue
+import select
+import threading
+from contextlib import contextmanager
+from functools import partial
+from logging import getLogger
+from typing import Any, Generator
+from urllib.parse import urlencode, urlsplit
+
+from src.cache import LRUCache
+from src.database import Database
+from src.events import ChangeEvent, EventBus
+from src.protocol import READ_METHODS, WRITE_METHODS, decode, encode
+
+
+logger = getLogger(__name__)
+
+# Kept alive connections to the server
+POOL_SIZE = 4
+# Read results kept for revalidation with If-None-Match
+ETAG_CACHE_SIZE = 256
+
+
+class RemoteError(ConnectionError):
+    """
+    Raised when the server can't be reached or rejects a request.
+    """
+
+
+class RemoteDatabase:
+    """
+    Talks to an InventoryServer and offers the methods of Database.
+
+    Reads are conditional GET requests, a result that didn't change since the last
+    request is answered with 304 Not Modified and taken from the local cache.
+    Change events of writes are returned by the server and published on events.
+
+    Attributes:
+        url (str): The URL of the server, e.g. "http://127.0.0.1:8750".
+        token (str | None): The shared token of the server, sent with every request.
+        events (EventBus): Publishes the changes made through this client.
+        notModified (int): The number of reads answered from the cache.
+    """
+
+    def __init__(self, url: str, timeout: float = 10.0, poolSize: int = POOL_SIZE, token: str | None = None) -> None:
+        parts = urlsplit(url)
+        if parts.scheme != "http" or not parts.hostname:
+            raise ValueError(f"Invalid server URL: {url}")
+        self.url = url
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.token = token
+        self.events = EventBus()
+        self.cache = None
+        self.notModified = 0
+        self.connections = 0
+        self._pool: queue.LifoQueue[http.client.HTTPConnection] = queue.LifoQueue(maxsize=poolSize)
+        self._etags = LRUCache(ETAG_CACHE_SIZE)
+        # The writes buffered by transaction, per thread
+        self._local = threading.local()
+
+    def __getattr__(self, name: str):
+        if name in READ_METHODS or name in WRITE_METHODS:
+            return partial(self.call, name)
+        raise AttributeError(name)
+
+    def _connection(self) -> http.client.HTTPConnection:
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                self.connections += 1
+                return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            # An idle kept alive socket is only readable if the server closed it
+            if conn.sock is not None and select.select([conn.sock], [], [], 0)[0]:
+                conn.close()
+                continue
+            return conn
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _request(self, method: str, path: str, body: bytes | None = None, headers: dict | None = None) -> tuple[int, dict, bytes]:
+        headers = {"Content-Type": "application/json", **(headers or {})}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        # A kept alive connection may be closed by the server after the check in _connection.
+        # Only a GET is sent again, a POST may have reached the server and would be applied twice
+        for attempt in range(2 if method == "GET" else 1):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                conn.close()
+                if attempt == 0 and method == "GET":
+                    continue
+                raise RemoteError(f"Server connection error: {e}") from e
+            except OSError as e:
+                conn.close()
+                raise RemoteError(f"Server connection error: {e}") from e
+            self._release(conn)
+            return response.status, dict(response.getheaders()), data
+        raise RemoteError("Server connection error")
+
+    def _get(self, path: str) -> dict:
+        cached = self._etags.get(path)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+        status, responseHeaders, data = self._request("GET", path, headers=headers)
+        if status == 304 and cached:
+            self.notModified += 1
+            return json.loads(cached[1])
+        body = self._check(status, data)
+        if "ETag" in responseHeaders:
+            self._etags.put(path, (responseHeaders["ETag"], data))
+        return body
+
+    def _post(self, path: str, payload: dict) -> dict:
+        status, _, data = self._request("POST", path, json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        body = self._check(status, data)
+        for kind, action, id, locationID in body.get("events", []):
+            self.events.publish(ChangeEvent(kind, action, id, locationID))
+        return body
+
+    def _check(self, status: int, data: bytes) -> dict:
+        body = json.loads(data or b"{}")
+        if status != 200:
+            raise RemoteError(f"Server error {status}: {body.get('error')}")
+        return body
+
+    def connect(self) -> bool:
+        try:
+            self._get("/health")
+            logger.info(f"Connected to server {self.url}")
+            return True
+        except (RemoteError, ValueError) as e:
+            logger.error("Server connection error")
+            logger.debug(e)
+            return False
+
+    def call(self, method: str, *args, **kwargs) -> Any:
+        """
+        Runs a Database method on the server, reads as a conditional GET.
+        """
+        if method in READ_METHODS:
+            query = {"method": method}
+            if args:
+                query["args"] = json.dumps(encode(list(args)), separators=(",", ":"))
+            if kwargs:
+                query["kwargs"] = json.dumps(encode(kwargs), separators=(",", ":"))
+            return decode(self._get(f"/call?{urlencode(query)}")["result"])
+        buffered = getattr(self._local, "calls", None)
+        if buffered is not None:
+            buffered.append((method, args, kwargs))
+            return None
+        body = self._post("/call", {"method": method, "args": encode(list(args)), "kwargs": encode(kwargs)})
+        return decode(body["result"])
+
+    def batch(self, calls: list[tuple[str, tuple, dict]], transaction: bool = False) -> list[Any]:
+        """
+        Runs many Database methods with a single request.
+
+        Args:
+            calls (list[tuple[str, tuple, dict]]): Tuples of method name, positional and keyword arguments.
+            transaction (bool): Whether the server runs all calls in a single transaction.
+
+        Returns:
+            list[Any]: The result of every call.
+        """
+        encoded = [{"method": method, "args": encode(list(args)), "kwargs": encode(kwargs)} for method, args, kwargs in calls]
+        if not transaction and all(method in READ_METHODS for method, _, _ in calls):
+            body = self._get(f"/batch?{urlencode({'calls': json.dumps(encoded, separators=(',', ':'))})}")
+        else:
+            body = self._post("/batch", {"calls": encoded, "transaction": transaction})
+        return [decode(result) for result in body["results"]]
+
+    @contextmanager
+    def transaction(self) -> Generator[list, None, None]:
+        """
+        Buffers the writes inside the block and sends them as one batch with transaction=True at the end.
+
+        Buffered writes return None, their results are put into the yielded list after the block.
+        Reads are sent at once and don't see the buffered writes. Nothing is sent if the block raises.
+        Nested transactions join the outer one.
+
+        Yields:
+            list: The results of the buffered writes, filled when the block ends.
+
+        Raises:
+            RemoteError: If the batch can't be sent or the server rejects it.
+        """
+        if getattr(self._local, "calls", None) is not None:
+            yield self._local.results
+            return
+
+        self._local.calls = []
+        self._local.results = []
+        try:
+            yield self._local.results
+            calls = self._local.calls
+            self._local.calls = None
+            if calls:
+                self._local.results.extend(self.batch(calls, transaction=True))
+        finally:
+            self._local.calls = None
+            self._local.results = None
+
+    def clearCache(self) -> None:
+        self._etags.clear()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def openDatabase(config: dict) -> Database | RemoteDatabase:
+    """
+    Creates the database backend of the "database" config section, a server for http URLs.
+    """
+    url = config.get("database", {}).get("url") or ""
+    if url.startswith("http://"):
+        return RemoteDatabase(url, config["database"].get("timeout", 10.0), token=config["database"].get("token"))
+    return Database.fromConfig(config)
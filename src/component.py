@@ -1,12 +1,13 @@
 from logging import getLogger
+from typing import TYPE_CHECKING
 
-from PIL import Image, ImageOps
-
-from PIL.Image import Image as Img
-
+from .images import THUMBNAIL_SIZE, loadImage
 from .location import Location
 from pathlib import Path
 
+if TYPE_CHECKING:
+    from PIL.Image import Image as Img
+
 
 logger = getLogger(__name__)
 
@@ -20,7 +21,7 @@ class Component:
         name (str): The name of the component.
         description (str): The description of the component.
         price (float): The price of the component.
-        image (Img | None): The image of the component.
+        image (Img | None): The image of the component, loaded on first access.
         imagePath (str | Path | None): The path to the image file of the component.
         datasheetPath (str | Path | None): The path to the datasheet file of the component.
         locations (list[tuple[Location, int]]): The list of locations where the component is available.
@@ -31,25 +32,41 @@ class Component:
         self.name = name
         self.description: str = args.get("description", "")
         self.price: float  = round(float(args.get("price", 0.0)), 2)
-        self.image: Img | None = None
+        self._image: "Img | None" = args.get("image")
+        self._imageLoaded = self._image is not None
         self.imagePath: str | Path | None = args.get("imagePath")
         self.datasheetPath: str | Path | None = args.get("datasheetPath")
-        self.locations: list[tuple[Location, int]] = []
+        self.locations: list[tuple[Location, int]] = args.get("locations", [])
 
         if self.imagePath and isinstance(self.imagePath, Path):
             self.imagePath = str(self.imagePath)
         if self.datasheetPath and isinstance(self.datasheetPath, Path):
             self.datasheetPath = str(self.datasheetPath)
 
-        if self.imagePath:
-            try:
-                image = Image.open(self.imagePath)
-                self.image = ImageOps.fit(image, (128, 128))
-            except FileNotFoundError:
-                logger.error(f"Image not found: {self.imagePath}")
-            except Exception as e:
-                logger.error(f"Error opening image: {e}")
+    @property
+    def image(self) -> "Img | None":
+        if not self._imageLoaded:
+            self._imageLoaded = True
+            if self.imagePath:
+                self._image = loadImage(self.imagePath)
+        return self._image
+
+    @image.setter
+    def image(self, image: "Img | None") -> None:
+        self._image = image
+        self._imageLoaded = True
+
+    def thumbnail(self, size: int, render: bool = True) -> "Img | None":
+        """
+        Returns the image cropped to a square of the given edge length.
 
+        Args:
+            size (int): The edge length.
+            render (bool): Whether to render a missing thumbnail, see loadImage.
+        """
+        if size == THUMBNAIL_SIZE[0] and (render or self._imageLoaded):
+            return self.image
+        return loadImage(self.imagePath, (size, size), render) if self.imagePath else None
 
     @property
     def toDB(self) -> dict:
@@ -0,0 +1,35 @@
+import json
+from logging import getLogger
+from pathlib import Path
+
+
+logger = getLogger(__name__)
+
+
+def loadConfig(path: str | Path = "config.json") -> dict:
+    """
+    Loads the application configuration.
+
+    Args:
+        path (str | Path): The path to the JSON config file.
+
+    Returns:
+        dict: The configuration, empty if the file is missing, empty or invalid.
+    """
+    path = Path(path)
+    if not path.exists():
+        logger.warning(f"Config file \"{path}\" not found")
+        return {}
+    text = path.read_text(encoding="utf-8")
+    if not text.strip():
+        return {}
+    try:
+        config = json.loads(text)
+    except json.JSONDecodeError as e:
+        logger.error(f"Invalid config file \"{path}\"")
+        logger.debug(e)
+        return {}
+    if not isinstance(config, dict):
+        logger.error(f"Invalid config file \"{path}\"")
+        return {}
+    return config
@@ -0,0 +1,53 @@
+import threading
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Callable, Literal
+
+
+logger = getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """
+    Describes one change committed to the database.
+
+    Attributes:
+        kind (str): What changed, "component", "location" or "stock".
+        action (str): How it changed, "created", "updated" or "deleted".
+        id (int | None): The ID of the component or location, the component ID for stock changes.
+        locationID (int | None): The location ID for stock changes.
+    """
+
+    kind: Literal["component", "location", "stock"]
+    action: Literal["created", "updated", "deleted"]
+    id: int | None
+    locationID: int | None = None
+
+
+class EventBus:
+    """
+    Delivers change events to every subscriber on the thread that published them.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: list[Callable[[ChangeEvent], None]] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: Callable[[ChangeEvent], None]) -> None:
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[ChangeEvent], None]) -> None:
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def publish(self, event: ChangeEvent) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Error in change event subscriber: {e}")
@@ -0,0 +1,100 @@
+import csv
+import gzip
+import json
+import os
+from logging import getLogger
+from pathlib import Path
+from typing import IO, Iterable
+
+from src.database import EXPORT_COLUMNS, Database
+
+
+logger = getLogger(__name__)
+
+
+def _open(path: Path, compress: bool) -> IO[str]:
+    if compress:
+        return gzip.open(path, "wt", newline="", encoding="utf-8")
+    return open(path, "w", newline="", encoding="utf-8")
+
+
+def writeRecords(path: str | Path, records: Iterable[dict], columns: list[str]) -> int:
+    """
+    Writes records one by one to a CSV file with a header row or a JSON Lines file.
+
+    Args:
+        path (str | Path): The file to write, the format is chosen by its suffix, a further .gz suffix compresses it.
+        records (Iterable[dict]): The records to write, consumed lazily.
+        columns (list[str]): The columns to write, in this order.
+
+    Returns:
+        int: The number of written records.
+
+    Raises:
+        ValueError: If the file type is not supported.
+        OperationalError: If the database fails while streaming the records, the file is not written then.
+    """
+    path = Path(path)
+    suffixes = [suffix.lower() for suffix in path.suffixes]
+    suffix = suffixes[-2] if suffixes[-1:] == [".gz"] and len(suffixes) > 1 else path.suffix.lower()
+    if suffix not in (".csv", ".jsonl", ".ndjson"):
+        raise ValueError(f"Unsupported file type: {suffix}")
+    # Written aside and renamed when complete, so a failed export never leaves a cut off file behind
+    partial = path.with_name(f"{path.name}.partial")
+    try:
+        count = _writeRecords(partial, suffix, suffixes[-1:] == [".gz"], records, columns)
+        os.replace(partial, path)
+    finally:
+        partial.unlink(missing_ok=True)
+    return count
+
+
+def _writeRecords(path: Path, suffix: str, compress: bool, records: Iterable[dict], columns: list[str]) -> int:
+    count = 0
+    with _open(path, compress) as f:
+        if suffix == ".csv":
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+            writer.writeheader()
+            for record in records:
+                writer.writerow(record)
+                count += 1
+        else:
+            for record in records:
+                f.write(json.dumps({column: record[column] for column in columns}, ensure_ascii=False))
+                f.write("\n")
+                count += 1
+    return count
+
+
+def exportTable(db: Database, table: str, path: str | Path, columns: list[str] | None = None) -> int:
+    """
+    Exports a table to a file, streaming rows from the database cursor to the file in constant memory.
+
+    The files of components, locations and stock can be read again by the importer, which
+    matches parents, components and locations by name, so the IDs may differ in the new database.
+
+    Args:
+        db (Database): The database to export from.
+        table (str): One of "components", "locations" or "stock".
+        path (str | Path): The file to write, see writeRecords.
+        columns (list[str] | None): The columns to export, all if None.
+
+    Returns:
+        int: The number of exported rows.
+    """
+    columns = columns or EXPORT_COLUMNS[table]
+    count = writeRecords(path, db.streamRows(table, columns), columns)
+    logger.info(f"Exported {count} {table} rows to \"{path}\"")
+    return count
+
+
+def exportComponents(db: Database, path: str | Path, columns: list[str] | None = None) -> int:
+    return exportTable(db, "components", path, columns)
+
+
+def exportLocations(db: Database, path: str | Path, columns: list[str] | None = None) -> int:
+    return exportTable(db, "locations", path, columns)
+
+
+def exportStock(db: Database, path: str | Path, columns: list[str] | None = None) -> int:
+    return exportTable(db, "stock", path, columns)
@@ -0,0 +1,344 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from logging import getLogger
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator
+
+from src.blobs import hashFile
+from src.cache import LRUCache
+
+if TYPE_CHECKING:
+    from PIL.Image import Image as Img
+
+
+logger = getLogger(__name__)
+
+# Size of the thumbnails shown for components
+THUMBNAIL_SIZE = (128, 128)
+# Sizes pre-rendered by the thumbnail cache, the component list, the popups and the info panel
+THUMBNAIL_SIZES = (128, 100, 64)
+# Seconds after which evict removes the temporary file of an interrupted write, a newer one may still be written
+STALE_TEMP_AGE = 3600
+# Decoded images kept in memory, shared by every Component with the same image path
+IMAGE_CACHE_SIZE = 512
+
+imageCache = LRUCache(IMAGE_CACHE_SIZE)
+# Set by useThumbnailCache, images are decoded from the originals without it
+thumbnailCache: "ThumbnailCache | None" = None
+
+
+def decodeImage(path: str | Path, sizes: tuple[tuple[int, int], ...]) -> "list[Img]":
+    """
+    Opens an image once and crops it to every size.
+
+    JPEG files are decoded at a reduced resolution that still covers the largest size.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as opened:
+        opened.draft(None, (max(width for width, _ in sizes), max(height for _, height in sizes)))
+        image = opened if opened.mode in ("RGB", "RGBA", "L", "LA") else opened.convert("RGBA")
+        return [ImageOps.fit(image, size) for size in sizes]
+
+
+def thumbnailFile(directory: Path, digest: str, size: int) -> Path:
+    return directory / digest[:2] / f"{digest}-{size}.png"
+
+
+def renderFiles(directory: Path, sizes: tuple[int, ...], path: str, digest: str | None = None) -> tuple[str, int, int, str]:
+    """
+    Hashes an image and writes its missing thumbnails.
+
+    Touches no shared state, so it can run in worker threads and processes.
+
+    Returns:
+        tuple[str, int, int, str]: The path, modification time, size and hash of the image.
+    """
+    stat = os.stat(path)
+    digest = digest or hashFile(path)
+    missing = [size for size in sizes if not thumbnailFile(directory, digest, size).is_file()]
+    if missing:
+        images = decodeImage(path, tuple((size, size) for size in missing))
+        thumbnailFile(directory, digest, 0).parent.mkdir(exist_ok=True)
+        for size, image in zip(missing, images):
+            target = thumbnailFile(directory, digest, size)
+            # Written aside and renamed, so readers never see a partial file
+            partial = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            image.save(partial, "PNG")
+            os.replace(partial, target)
+    return path, stat.st_mtime_ns, stat.st_size, digest
+
+
+class ThumbnailCache:
+    """
+    Pre-rendered thumbnails of the images in a directory.
+
+    Thumbnails are named after the SHA-256 of the original, so identical images share them.
+    An index maps each original to its modification time, size and hash, so an unchanged
+    file is neither hashed nor decoded again.
+
+    Attributes:
+        directory (Path): The directory of the thumbnails and the index.
+        sizes (tuple[int, ...]): The edge lengths rendered for every image.
+    """
+
+    def __init__(self, directory: str | Path, sizes: tuple[int, ...] = THUMBNAIL_SIZES) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.sizes = sizes
+        self._lock = threading.Lock()
+        # Renders in flight, evict doesn't run while there are any
+        self._rendering = 0
+        self._indexPath = self.directory / "index.json"
+        self._index: dict[str, list] = {}
+        try:
+            self._index = json.loads(self._indexPath.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            logger.error("Invalid thumbnail index, thumbnails are rendered again")
+            logger.debug(e)
+
+    def _saveIndex(self) -> None:
+        partial = self._indexPath.with_name(f"index.json.{os.getpid()}.{threading.get_ident()}.tmp")
+        partial.write_text(json.dumps(self._index), encoding="utf-8")
+        os.replace(partial, self._indexPath)
+
+    def _known(self, path: str | Path) -> str | None:
+        # The hash of an unchanged original, None if it has to be read
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._index.get(str(Path(path).resolve()))
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2]
+        return None
+
+    def _remember(self, path: str, mtime: int, size: int, digest: str, save: bool = True) -> None:
+        with self._lock:
+            self._index[str(Path(path).resolve())] = [mtime, size, digest]
+            if save:
+                self._saveIndex()
+
+    @contextmanager
+    def _renderScope(self) -> Iterator[None]:
+        # Waits for a running evict, then keeps the next one from deleting the files being written
+        with self._lock:
+            self._rendering += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._rendering -= 1
+
+    def cachedPath(self, path: str | Path, size: int) -> Path | None:
+        """
+        Returns the thumbnail of an image if it is already rendered, without reading the original.
+        """
+        digest = self._known(path)
+        if digest is None or size not in self.sizes:
+            return None
+        file = thumbnailFile(self.directory, digest, size)
+        return file if file.is_file() else None
+
+    def render(self, path: str | Path) -> str:
+        """
+        Renders the missing thumbnails of an image.
+
+        Args:
+            path (str | Path): The original image.
+
+        Returns:
+            str: The hash of the image.
+        """
+        with self._renderScope():
+            known = self._known(path)
+            _, mtime, size, digest = renderFiles(self.directory, self.sizes, str(path), known)
+            if known is None:
+                self._remember(str(path), mtime, size, digest)
+        return digest
+
+    def renderMany(self, paths: Iterable[str | Path], workers: int | None = None, processes: bool = False,
+                   progress: Callable[[int, int], None] | None = None) -> Iterator[tuple[str, str | None]]:
+        """
+        Renders the thumbnails of many images in a pool, yielding each image as soon as it is done.
+
+        Pillow and hashlib release the GIL while decoding, resizing and hashing, so threads
+        scale with the cores. Processes also parallelize the Python parts, but start slower.
+        Images that are already rendered are yielded first without touching the pool.
+        Closing the generator cancels the images that haven't started yet.
+
+        Args:
+            paths (Iterable[str | Path]): The original images.
+            workers (int | None): The size of the pool, the number of CPUs by default.
+            processes (bool): Whether to use a process pool instead of a thread pool.
+            progress (Callable[[int, int], None] | None): Called with the done and total images after every image.
+
+        Yields:
+            tuple[str, str | None]: The path and hash of an image, None if it can't be rendered.
+        """
+        with self._renderScope():
+            yield from self._renderMany(paths, workers, processes, progress)
+
+    def _renderMany(self, paths: Iterable[str | Path], workers: int | None, processes: bool,
+                    progress: Callable[[int, int], None] | None) -> Iterator[tuple[str, str | None]]:
+        paths = list(dict.fromkeys(str(path) for path in paths))
+        total = len(paths)
+        done = 0
+        pending: list[tuple[str, str | None]] = []
+        for path in paths:
+            digest = self._known(path)
+            if digest is not None and all(thumbnailFile(self.directory, digest, size).is_file() for size in self.sizes):
+                done += 1
+                if progress:
+                    progress(done, total)
+                yield path, digest
+            else:
+                pending.append((path, digest))
+        if not pending:
+            return
+
+        workers = workers or os.cpu_count() or 1
+        executor: Executor
+        if processes:
+            # Spawned, forking a process that runs Tk is not safe
+            executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+        else:
+            executor = ThreadPoolExecutor(workers, thread_name_prefix="thumbnails")
+        try:
+            futures = {executor.submit(renderFiles, self.directory, self.sizes, path, digest): path for path, digest in pending}
+            for future in as_completed(futures):
+                done += 1
+                if progress:
+                    progress(done, total)
+                try:
+                    path, mtime, size, digest = future.result()
+                except Exception as e:
+                    logger.error(f"Error rendering thumbnail: {futures[future]}")
+                    logger.debug(e)
+                    yield futures[future], None
+                    continue
+                self._remember(path, mtime, size, digest, save=False)
+                yield path, digest
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            with self._lock:
+                self._saveIndex()
+
+    def thumbnailPath(self, path: str | Path, size: int) -> Path:
+        """
+        Returns the thumbnail of an image, rendering it on first use.
+
+        Raises:
+            ValueError: If size is not one of the rendered sizes.
+            OSError: If the image can't be read.
+        """
+        if size not in self.sizes:
+            raise ValueError(f"Thumbnail size {size} is not rendered")
+        return thumbnailFile(self.directory, self.render(path), size)
+
+    def evict(self) -> int:
+        """
+        Forgets originals that were removed or changed and deletes the thumbnails no original uses.
+
+        Holds the lock while it scans and deletes, renders wait for it. It is skipped while
+        thumbnails are rendered, as their files are not in the index yet.
+
+        Returns:
+            int: The number of deleted thumbnail files.
+        """
+        with self._lock:
+            if self._rendering:
+                logger.info("Thumbnails are being rendered, eviction skipped")
+                return 0
+            for key, (mtime, size, _) in list(self._index.items()):
+                try:
+                    stat = os.stat(key)
+                except OSError:
+                    del self._index[key]
+                    continue
+                if stat.st_mtime_ns != mtime or stat.st_size != size:
+                    del self._index[key]
+            used = {entry[2] for entry in self._index.values()}
+            self._saveIndex()
+            deleted = 0
+            cutoff = time.time() - STALE_TEMP_AGE
+            for file in self.directory.glob("??/*"):
+                if file.name.endswith(".tmp"):
+                    # Possibly written by another process right now
+                    try:
+                        if file.stat().st_mtime > cutoff:
+                            continue
+                    except OSError:
+                        continue
+                elif file.name.split("-")[0] in used:
+                    continue
+                file.unlink(missing_ok=True)
+                deleted += 1
+        logger.info(f"Evicted {deleted} thumbnails")
+        return deleted
+
+
+def useThumbnailCache(directory: str | Path | None) -> "ThumbnailCache | None":
+    """
+    Makes loadImage read pre-rendered thumbnails from a directory, None turns it off.
+    """
+    global thumbnailCache
+    thumbnailCache = ThumbnailCache(directory) if directory is not None else None
+    imageCache.clear()
+    return thumbnailCache
+
+
+def loadImage(path: str | Path, size: tuple[int, int] = THUMBNAIL_SIZE, render: bool = True) -> "Img | None":
+    """
+    Opens an image and crops it to size.
+
+    Decoded images are cached per path, size and modification time, so copies of a
+    component share one image and a replaced file is decoded again.
+    Sizes of the thumbnail cache are read from its small files instead of the original.
+    Pillow is imported on the first call, so the data layer can be used without it.
+
+    Args:
+        path (str | Path): The image file.
+        size (tuple[int, int]): The size of the returned image.
+        render (bool): Whether to render a missing thumbnail, else None is returned until renderMany did.
+
+    Returns:
+        Img | None: The image, None if it can't be opened.
+    """
+    try:
+        key = (str(path), size, os.stat(path).st_mtime_ns)
+    except FileNotFoundError:
+        logger.error(f"Image not found: {path}")
+        return None
+    except OSError as e:
+        logger.error(f"Error opening image: {e}")
+        return None
+    image = imageCache.get(key)
+    if image is not None:
+        return image
+
+    from PIL import Image
+
+    try:
+        cache = thumbnailCache
+        if cache is not None and size[0] == size[1] and size[0] in cache.sizes:
+            file = cache.thumbnailPath(path, size[0]) if render else cache.cachedPath(path, size[0])
+            if file is None:
+                return None
+            with Image.open(file) as opened:
+                image = opened.copy()
+        else:
+            image = decodeImage(path, (size,))[0]
+    except Exception as e:
+        logger.error(f"Error opening image: {e}")
+        return None
+    imageCache.put(key, image)
+    return image
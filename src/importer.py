@@ -0,0 +1,159 @@
+import csv
+import json
+from itertools import islice
+from logging import getLogger
+from pathlib import Path
+from typing import Callable, Generator, Iterable, TypeVar
+
+from src.component import Component
+from src.database import Database
+from src.location import Location
+
+
+logger = getLogger(__name__)
+
+T = TypeVar("T")
+
+CHUNK_SIZE = 500
+
+
+def readRecords(path: str | Path) -> Generator[dict, None, None]:
+    """
+    Reads records one by one from a CSV file with a header row or a JSON Lines file.
+
+    Args:
+        path (str | Path): The file to read, the format is chosen by its suffix.
+
+    Yields:
+        dict: One record per row or line.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    with open(path, newline="", encoding="utf-8") as f:
+        if suffix == ".csv":
+            yield from csv.DictReader(f)
+        elif suffix in (".jsonl", ".ndjson"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise ValueError(f"Unsupported file type: {suffix}")
+
+
+def chunked(iterable: Iterable[T], size: int) -> Generator[list[T], None, None]:
+    """
+    Splits an iterable into lists of at most size items without reading it all.
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _importChunks(records: Iterable[T], create: Callable[[list[T]], list[bool]], chunkSize: int) -> tuple[int, int]:
+    imported = 0
+    skipped = 0
+    for chunk in chunked(records, chunkSize):
+        results = create(chunk)
+        imported += results.count(True)
+        skipped += results.count(False)
+    return imported, skipped
+
+
+def importComponents(db: Database, path: str | Path, chunkSize: int = CHUNK_SIZE) -> tuple[int, int]:
+    """
+    Imports components with the columns name, description, price, imagePath and datasheetPath.
+
+    Returns:
+        tuple[int, int]: The number of imported and skipped rows.
+    """
+    records = (
+        Component(
+            record["name"],
+            description=record.get("description") or "",
+            price=record.get("price") or 0.0,
+            imagePath=record.get("imagePath") or None,
+            datasheetPath=record.get("datasheetPath") or None
+        )
+        for record in readRecords(path)
+    )
+    imported, skipped = _importChunks(records, db.createComponents, chunkSize)
+    logger.info(f"Imported {imported} components from \"{path}\", skipped {skipped}")
+    return imported, skipped
+
+
+def importLocations(db: Database, path: str | Path, chunkSize: int = CHUNK_SIZE) -> tuple[int, int]:
+    """
+    Imports locations with the columns name, shortName, parent and description.
+
+    The parent is matched by name, files without a parent column use the column parentID.
+    Locations whose parent comes later in the file are created once the parent exists.
+
+    Returns:
+        tuple[int, int]: The number of imported and skipped rows.
+    """
+    imported = 0
+    skipped = 0
+    # Locations whose parent doesn't exist yet, by parent name
+    waiting: list[dict] = []
+
+    def create(records: list[dict]) -> None:
+        nonlocal imported, skipped
+        parents = db.getIdsForNames("location", {record["parent"] for record in records if record.get("parent")})
+        locations = []
+        for record in records:
+            if record.get("parent") and record["parent"] not in parents:
+                waiting.append(record)
+                continue
+            parentID = parents[record["parent"]] if record.get("parent") else int(record.get("parentID") or -1)
+            locations.append(Location(
+                record["name"],
+                shortName=record.get("shortName") or "",
+                parentID=parentID,
+                description=record.get("description") or ""
+            ))
+        results = db.createLocations(locations)
+        imported += results.count(True)
+        skipped += results.count(False)
+
+    for chunk in chunked(readRecords(path), chunkSize):
+        create(chunk)
+    # Retry the waiting locations until no more of their parents appear
+    while waiting:
+        retry, waiting = waiting, []
+        for chunk in chunked(retry, chunkSize):
+            create(chunk)
+        if len(waiting) == len(retry):
+            for record in waiting:
+                logger.warning(f"Parent location \"{record['parent']}\" of \"{record['name']}\" not found")
+            skipped += len(waiting)
+            break
+    logger.info(f"Imported {imported} locations from \"{path}\", skipped {skipped}")
+    return imported, skipped
+
+
+def importStock(db: Database, path: str | Path, chunkSize: int = CHUNK_SIZE) -> tuple[int, int]:
+    """
+    Imports stock with the columns component, location and amount.
+
+    Components and locations are matched by name, files without these columns use the
+    columns componentID and locationID.
+
+    Returns:
+        tuple[int, int]: The number of imported and skipped rows.
+    """
+    def setStock(records: list[dict]) -> list[bool]:
+        components = db.getIdsForNames("component", {record["component"] for record in records if record.get("component")})
+        locations = db.getIdsForNames("location", {record["location"] for record in records if record.get("location")})
+        stock = [
+            (
+                components.get(record["component"], -1) if record.get("component") else int(record["componentID"]),
+                locations.get(record["location"], -1) if record.get("location") else int(record["locationID"]),
+                int(record["amount"])
+            )
+            for record in records
+        ]
+        return db.setStock(stock)
+
+    imported, skipped = _importChunks(readRecords(path), setStock, chunkSize)
+    logger.info(f"Imported {imported} stock rows from \"{path}\", skipped {skipped}")
+    return imported, skipped
@@ -0,0 +1,210 @@
+from logging import getLogger
+from typing import Callable
+
+from sqlalchemy import Connection, Engine
+from sqlmodel import SQLModel
+
+# Registers the tables in SQLModel.metadata
+from src import models  # noqa: F401
+
+
+logger = getLogger(__name__)
+
+
+def getSchemaVersion(conn: Connection) -> int:
+    """
+    Returns the schema version stored in the SQLite user_version pragma.
+
+    Args:
+        conn (Connection): An open connection to the database.
+
+    Returns:
+        int: The schema version, 0 for a database that was never migrated.
+    """
+    return int(conn.exec_driver_sql("PRAGMA user_version").scalar() or 0)
+
+
+def setSchemaVersion(conn: Connection, version: int) -> None:
+    conn.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+
+def _createBaseTables(conn: Connection) -> None:
+    # Tables that existed before versioning, only created if missing
+    tables = [SQLModel.metadata.tables[name] for name in ("components", "locations", "componentlocationmap")]
+    SQLModel.metadata.create_all(conn, tables=tables)
+
+
+def _addIndexesAndForeignKeys(conn: Connection) -> None:
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_components_name ON components (name)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_locations_name ON locations (name)")
+    if conn.exec_driver_sql("PRAGMA foreign_key_list(componentlocationmap)").all():
+        return
+    # SQLite can't add foreign keys or unique indexes to an existing table, rebuild it
+    logger.info("Rebuilding table \"componentlocationmap\"")
+    conn.exec_driver_sql("ALTER TABLE componentlocationmap RENAME TO componentlocationmap_old")
+    SQLModel.metadata.tables["componentlocationmap"].create(conn)
+    # Merge duplicate rows and drop rows pointing to missing components or locations
+    orphaned, orphanedAmount = conn.exec_driver_sql(
+        "SELECT count(*), coalesce(sum(amount), 0) FROM componentlocationmap_old "
+        "WHERE \"componentID\" NOT IN (SELECT id FROM components) OR \"locationID\" NOT IN (SELECT id FROM locations)"
+    ).one()
+    if orphaned:
+        logger.warning(f"Dropping {orphaned} stock rows with a total amount of {orphanedAmount} "
+                       "that point to missing components or locations")
+    duplicates = conn.exec_driver_sql(
+        "SELECT coalesce(sum(rows - 1), 0) FROM (SELECT count(*) AS rows FROM componentlocationmap_old "
+        "WHERE \"componentID\" IN (SELECT id FROM components) AND \"locationID\" IN (SELECT id FROM locations) "
+        "GROUP BY \"componentID\", \"locationID\" HAVING count(*) > 1)"
+    ).scalar()
+    if duplicates:
+        logger.warning(f"Merging {duplicates} duplicate stock rows into the row of the same component and location")
+    conn.exec_driver_sql(
+        "INSERT INTO componentlocationmap (id, \"componentID\", amount, \"locationID\") "
+        "SELECT MIN(id), \"componentID\", SUM(amount), \"locationID\" FROM componentlocationmap_old "
+        "WHERE \"componentID\" IN (SELECT id FROM components) AND \"locationID\" IN (SELECT id FROM locations) "
+        "GROUP BY \"componentID\", \"locationID\""
+    )
+    conn.exec_driver_sql("DROP TABLE componentlocationmap_old")
+
+
+def _addPriceIndex(conn: Connection) -> None:
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_components_price ON components (price)")
+
+
+def _addParentIndex(conn: Connection) -> None:
+    # Walking the location tree downwards looks up children by parent
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS \"ix_locations_parentID\" ON locations (\"parentID\")")
+
+
+SEARCH_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS components_search_insert AFTER INSERT ON components BEGIN
+        INSERT INTO search (rowid, name, "shortName", description)
+        VALUES (new.id * 2, new.name, '', coalesce(new.description, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS components_search_update AFTER UPDATE ON components BEGIN
+        DELETE FROM search WHERE rowid = old.id * 2;
+        INSERT INTO search (rowid, name, "shortName", description)
+        VALUES (new.id * 2, new.name, '', coalesce(new.description, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS components_search_delete AFTER DELETE ON components BEGIN
+        DELETE FROM search WHERE rowid = old.id * 2;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS locations_search_insert AFTER INSERT ON locations BEGIN
+        INSERT INTO search (rowid, name, "shortName", description)
+        VALUES (new.id * 2 + 1, new.name, new."shortName", new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS locations_search_update AFTER UPDATE ON locations BEGIN
+        DELETE FROM search WHERE rowid = old.id * 2 + 1;
+        INSERT INTO search (rowid, name, "shortName", description)
+        VALUES (new.id * 2 + 1, new.name, new."shortName", new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS locations_search_delete AFTER DELETE ON locations BEGIN
+        DELETE FROM search WHERE rowid = old.id * 2 + 1;
+    END""",
+]
+
+
+def _createSearchIndex(conn: Connection) -> None:
+    # Components get even and locations odd rowids, so triggers find their row without a scan
+    conn.exec_driver_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search USING fts5("
+        "name, \"shortName\", description, tokenize = 'unicode61', prefix = '2 3')"
+    )
+    for trigger in SEARCH_TRIGGERS:
+        conn.exec_driver_sql(trigger)
+    # Index the existing rows
+    conn.exec_driver_sql("DELETE FROM search")
+    conn.exec_driver_sql(
+        "INSERT INTO search (rowid, name, \"shortName\", description) "
+        "SELECT id * 2, name, '', coalesce(description, '') FROM components"
+    )
+    conn.exec_driver_sql(
+        "INSERT INTO search (rowid, name, \"shortName\", description) "
+        "SELECT id * 2 + 1, name, \"shortName\", description FROM locations"
+    )
+
+
+LEDGER_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS stock_ledger_insert AFTER INSERT ON componentlocationmap
+    WHEN new.amount > 0 BEGIN
+        INSERT INTO stockmovements ("componentID", "locationID", delta, amount, timestamp)
+        VALUES (new."componentID", new."locationID", new.amount, new.amount, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS stock_ledger_update AFTER UPDATE OF amount ON componentlocationmap
+    WHEN new.amount != old.amount BEGIN
+        INSERT INTO stockmovements ("componentID", "locationID", delta, amount, timestamp)
+        VALUES (new."componentID", new."locationID", new.amount - old.amount, new.amount, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS stock_ledger_delete AFTER DELETE ON componentlocationmap
+    WHEN old.amount > 0 BEGIN
+        INSERT INTO stockmovements ("componentID", "locationID", delta, amount, timestamp)
+        VALUES (old."componentID", old."locationID", -old.amount, 0, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END""",
+]
+
+
+def _createStockLedger(conn: Connection) -> None:
+    # Triggers write the ledger in the transaction of every stock change, whichever code path made it
+    tables = [SQLModel.metadata.tables[name] for name in ("stockmovements", "stocksnapshots")]
+    SQLModel.metadata.create_all(conn, tables=tables)
+    for trigger in LEDGER_TRIGGERS:
+        conn.exec_driver_sql(trigger)
+    # The stock of an existing database is its opening balance
+    if not conn.exec_driver_sql("SELECT 1 FROM stockmovements LIMIT 1").first():
+        conn.exec_driver_sql(
+            "INSERT INTO stockmovements (\"componentID\", \"locationID\", delta, amount, timestamp) "
+            "SELECT \"componentID\", \"locationID\", amount, amount, strftime('%Y-%m-%d %H:%M:%f', 'now') "
+            "FROM componentlocationmap WHERE amount > 0"
+        )
+
+
+def _addMovementKind(conn: Connection) -> None:
+    # Tells transfers between locations apart from stock that was added or consumed
+    columns = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(stockmovements)")]
+    if "kind" not in columns:
+        conn.exec_driver_sql("ALTER TABLE stockmovements ADD COLUMN kind VARCHAR NOT NULL DEFAULT 'adjust'")
+
+
+# Ordered list of migrations, the position + 1 is the schema version after it ran.
+# Migrations have to be idempotent, a fresh database runs all of them.
+MIGRATIONS: list[Callable[[Connection], None]] = [
+    _createBaseTables,
+    _addIndexesAndForeignKeys,
+    _addPriceIndex,
+    _createSearchIndex,
+    _addParentIndex,
+    _createStockLedger,
+    _addMovementKind,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(engine: Engine) -> int:
+    """
+    Upgrades the database schema in place to the latest version.
+
+    Every migration runs in its own transaction together with the version update.
+
+    Args:
+        engine (Engine): The engine of the database to migrate.
+
+    Returns:
+        int: The schema version of the database after migrating.
+    """
+    if engine.dialect.name != "sqlite":
+        SQLModel.metadata.create_all(engine)
+        return SCHEMA_VERSION
+
+    with engine.connect() as conn:
+        version = getSchemaVersion(conn)
+    if version > SCHEMA_VERSION:
+        logger.warning(f"Database schema version {version} is newer than supported version {SCHEMA_VERSION}")
+        return version
+
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        logger.info(f"Migrating database to schema version {number}")
+        with engine.begin() as conn:
+            migration(conn)
+            setSchemaVersion(conn, number)
+    return max(version, SCHEMA_VERSION)
@@ -0,0 +1,95 @@
+from sqlmodel import Field, SQLModel
+from sqlalchemy import Index
+
+
+class Components(SQLModel, table=True):
+    id: int | None = Field(default=None, primary_key=True)
+    name: str = Field(index=True)
+    description: str | None = None
+    price: float = Field(index=True)
+    imagePath: str | None = None
+    datasheetPath: str | None = None
+
+    def toDict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "description": self.description,
+            "price": self.price,
+            "imagePath": self.imagePath,
+            "datasheetPath": self.datasheetPath
+        }
+
+
+class ComponentLocationMap(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_componentlocationmap_componentID_locationID", "componentID", "locationID", unique=True),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    componentID: int = Field(foreign_key="components.id")
+    amount: int
+    locationID: int = Field(foreign_key="locations.id", index=True)
+
+    def toDict(self) -> dict:
+        return {
+            "id": self.id,
+            "componentID": self.componentID,
+            "amount": self.amount,
+            "locationID": self.locationID
+        }
+
+
+class Locations(SQLModel, table=True):
+    id: int | None = Field(default=None, primary_key=True)
+    parentID: int = Field(index=True)
+    name: str = Field(index=True)
+    shortName: str
+    description: str
+
+    def toDict(self) -> dict:
+        return {
+            "id": self.id,
+            "parentID": self.parentID,
+            "name": self.name,
+            "shortName": self.shortName,
+            "description": self.description
+        }
+
+
+class StockMovements(SQLModel, table=True):
+    """
+    Append-only ledger of stock changes, written by triggers on componentlocationmap.
+
+    The IDs have no foreign keys, so the history stays when a component or location is deleted.
+    Timestamps are UTC text in the format "YYYY-MM-DD HH:MM:SS.SSS".
+    The kind is "move" for both halves of a transfer by Database.moveStock, else "adjust".
+    """
+    __table_args__ = (
+        Index("ix_stockmovements_componentID_timestamp", "componentID", "timestamp"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    componentID: int
+    locationID: int
+    delta: int
+    amount: int
+    timestamp: str = Field(index=True)
+    kind: str = Field(default="adjust", sa_column_kwargs={"server_default": "adjust"})
+
+
+class StockSnapshots(SQLModel, table=True):
+    """
+    Movements of one month folded into a single row by Database.compactLedger.
+    """
+    __table_args__ = (
+        Index("ix_stocksnapshots_componentID_locationID_month", "componentID", "locationID", "month", unique=True),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    componentID: int
+    locationID: int
+    month: str = Field(index=True)
+    amount: int
+    added: int
+    consumed: int
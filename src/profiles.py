@@ -0,0 +1,79 @@
+from logging import getLogger
+
+
+logger = getLogger(__name__)
+
+
+# Named SQLite performance profiles, applied as PRAGMAs on every new connection.
+# cache_size is negative to be in KiB instead of pages.
+PROFILES: dict[str, dict[str, str | int]] = {
+    "default": {},
+    "safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -16000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
+
+DEFAULT_PROFILE = "safe"
+
+# Allowed keyword values, every other PRAGMA takes an integer
+PRAGMA_KEYWORDS: dict[str, set[str]] = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+}
+INTEGER_PRAGMAS = {"cache_size", "mmap_size", "busy_timeout"}
+
+
+def getProfile(profile: str | None = None, pragmas: dict | None = None) -> dict[str, str | int]:
+    """
+    Resolves a named profile and validates the PRAGMAs of it.
+
+    Args:
+        profile (str | None): The name of the profile, the default profile if None.
+        pragmas (dict | None): PRAGMAs overriding the ones of the profile.
+
+    Returns:
+        dict[str, str | int]: The PRAGMAs to apply.
+
+    Raises:
+        ValueError: If the profile or a PRAGMA is unknown or has an invalid value.
+    """
+    name = profile or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown database profile: {name}")
+    resolved = dict(PROFILES[name])
+    resolved.update(pragmas or {})
+    for pragma, value in resolved.items():
+        if pragma in PRAGMA_KEYWORDS:
+            if str(value).upper() not in PRAGMA_KEYWORDS[pragma]:
+                raise ValueError(f"Invalid value for PRAGMA {pragma}: {value}")
+            resolved[pragma] = str(value).upper()
+        elif pragma in INTEGER_PRAGMAS:
+            resolved[pragma] = int(value)
+        else:
+            raise ValueError(f"Unsupported PRAGMA: {pragma}")
+    return resolved
+
+
+def applyProfile(dbapiConnection, pragmas: dict[str, str | int]) -> None:
+    """
+    Applies the PRAGMAs of a resolved profile to a raw SQLite connection.
+    """
+    cursor = dbapiConnection.cursor()
+    # busy_timeout first, switching the journal mode needs a lock
+    for pragma in sorted(pragmas, key=lambda p: p != "busy_timeout"):
+        cursor.execute(f"PRAGMA {pragma}={pragmas[pragma]}")
+    cursor.close()
@@ -0,0 +1,93 @@
+import json
+from datetime import datetime
+from typing import Any
+
+from sqlmodel import SQLModel
+
+from src.component import Component
+from src.models import ComponentLocationMap, StockMovements, StockSnapshots
+from src.location import Location
+
+
+# Database methods the server exposes, reads can be sent as conditional GET requests
+READ_METHODS = {
+    "getComponents", "getComponent", "queryComponents", "search",
+    "getLocations", "getLocation", "getLocationAncestors", "getLocationDescendants", "getLocationPath", "getSubtreeTotals",
+    "getComponentLocationMap", "getComponentAmountInLocation", "getComponentsInLocation",
+    "getLocationsIdForComponent", "getLocationsForComponent", "getAllComponentAmount",
+    "getComponentTotals", "getLocationTotals", "getInventoryValue",
+    "getMovements", "getStockAt", "getConsumptionPerMonth", "getFileReferences", "getImagePaths",
+    "getIdsForNames",
+}
+WRITE_METHODS = {
+    "createComponent", "createComponents", "deleteComponent", "updateComponent",
+    "createLocation", "createLocations", "deleteLocation", "updateLocation",
+    "createComponentLocationMap", "setStock", "addComponentToLocation", "removeComponentFromLocation", "adjustStock", "moveStock",
+    "compactLedger",
+}
+
+ROWS: dict[str, type[SQLModel]] = {
+    "ComponentLocationMap": ComponentLocationMap,
+    "StockMovements": StockMovements,
+    "StockSnapshots": StockSnapshots,
+}
+
+
+def encode(value: Any) -> Any:
+    """
+    Converts arguments and results of Database methods into JSON compatible values.
+
+    Components, locations, table rows, tuples and datetimes are tagged, so decode restores them.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Component):
+        return {
+            "__type__": "Component",
+            "id": value.id,
+            **value.toDB,
+            "locations": [[encode(location), amount] for location, amount in value.locations]
+        }
+    if isinstance(value, Location):
+        return {"__type__": "Location", "id": value.id, **value.toDB}
+    if isinstance(value, SQLModel):
+        return {"__type__": type(value).__name__, **value.model_dump()}
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, tuple):
+        return {"__tuple__": [encode(item) for item in value]}
+    if isinstance(value, dict):
+        return {str(key): encode(item) for key, item in value.items()}
+    # Lists, sets and generators
+    return [encode(item) for item in value]
+
+
+def decode(value: Any) -> Any:
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "__tuple__" in value:
+        return tuple(decode(item) for item in value["__tuple__"])
+    if "__datetime__" in value:
+        return datetime.fromisoformat(value["__datetime__"])
+    kind = value.get("__type__")
+    fields = {key: item for key, item in value.items() if key != "__type__"}
+    if kind == "Component":
+        locations = fields.pop("locations", [])
+        component = Component(fields.pop("name"), **fields)
+        component.locations = [(decode(location), amount) for location, amount in locations]
+        return component
+    if kind == "Location":
+        return Location(fields.pop("name"), **fields)
+    if kind in ROWS:
+        return ROWS[kind](**fields)
+    return {key: decode(item) for key, item in value.items()}
+
+
+def dumps(value: Any) -> bytes:
+    return json.dumps(encode(value), separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes | str) -> Any:
+    return decode(json.loads(data))
@@ -0,0 +1,230 @@
+import argparse
+import json
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging import getLogger
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+from src.config import loadConfig
+from src.database import Database
+from src.events import ChangeEvent
+from src.protocol import READ_METHODS, WRITE_METHODS, decode, dumps, encode
+
+
+logger = getLogger(__name__)
+
+DEFAULT_PORT = 8750
+
+
+class InventoryServer(ThreadingHTTPServer):
+    """
+    Serves a Database over HTTP with JSON bodies, see RequestHandler for the endpoints.
+
+    Every change published by the database increases a version, read responses carry it
+    as their ETag, so clients can revalidate cached results with a conditional GET.
+    The ETag also holds PRAGMA data_version of SQLite files, so writes that publish no event,
+    like compactLedger or another process, change it as well.
+
+    Without a token every client that can reach the address can read and change the inventory,
+    so only serve on localhost or a trusted network then.
+
+    Attributes:
+        db (Database): The served database.
+        version (int): The number of changes since the server started.
+        token (str | None): The shared token clients send as "Authorization: Bearer <token>", None to accept all.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, db: Database, address: tuple[str, int] = ("127.0.0.1", DEFAULT_PORT), token: str | None = None) -> None:
+        super().__init__(address, RequestHandler)
+        self.db = db
+        self.token = token
+        self.version = 0
+        # Tells apart the versions of two server runs
+        self._instance = secrets.token_hex(4)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        db.events.subscribe(self._onChange)
+
+    @property
+    def etag(self) -> str:
+        return f"\"{self._instance}-{self.version}-{self.db.dataVersion()}\""
+
+    def _onChange(self, event: ChangeEvent) -> None:
+        with self._lock:
+            self.version += 1
+        # Events are published on the thread that made the change, so they belong to its request
+        collected = getattr(self._local, "events", None)
+        if collected is not None:
+            collected.append([event.kind, event.action, event.id, event.locationID])
+
+    def call(self, method: str, args: list | None = None, kwargs: dict | None = None) -> Any:
+        if method not in READ_METHODS and method not in WRITE_METHODS:
+            raise KeyError(method)
+        return getattr(self.db, method)(*decode(args or []), **decode(kwargs or {}))
+
+    def run(self, calls: list[dict], transaction: bool = False) -> tuple[list, list]:
+        """
+        Runs calls of the form {"method": ..., "args": [...], "kwargs": {...}} one after another.
+
+        Args:
+            calls (list[dict]): The calls to run.
+            transaction (bool): Whether to run all calls in a single transaction.
+
+        Returns:
+            tuple[list, list]: The encoded results and the change events the calls caused.
+        """
+        self._local.events = []
+        try:
+            if transaction:
+                with self.db.transaction():
+                    results = [self.call(c["method"], c.get("args"), c.get("kwargs")) for c in calls]
+            else:
+                results = [self.call(c["method"], c.get("args"), c.get("kwargs")) for c in calls]
+            return [encode(result) for result in results], self._local.events
+        finally:
+            self._local.events = None
+
+    def close(self) -> None:
+        self.db.events.unsubscribe(self._onChange)
+        self.shutdown()
+        self.server_close()
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """
+    Endpoints:
+        GET /health: The current version.
+        GET /call?method=...&args=[...]&kwargs={...}: Runs one read method.
+        GET /batch?calls=[...]: Runs many read methods, one refresh is one request.
+        POST /call with {"method", "args", "kwargs"}: Runs one method.
+        POST /batch with {"calls": [...], "transaction": bool}: Runs many methods, optionally in one transaction.
+
+    GET responses carry an ETag and answer If-None-Match with 304 Not Modified.
+    Every request needs the token of the server, if it has one, else it is answered with 401.
+    """
+
+    server: InventoryServer
+    # Keep-alive connections
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def sendJson(self, status: int, body: Any, etag: str | None = None) -> None:
+        data = json.dumps(body, separators=(",", ":")).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def handle_one_request(self) -> None:
+        try:
+            super().handle_one_request()
+        except ConnectionError:
+            self.close_connection = True
+
+    def authorized(self) -> bool:
+        if self.server.token is None:
+            return True
+        if secrets.compare_digest(self.headers.get("Authorization", "").encode(), f"Bearer {self.server.token}".encode()):
+            return True
+        # The body of the request is left unread, so the connection can't be reused
+        self.close_connection = True
+        self.sendJson(401, {"error": "Invalid token"})
+        return False
+
+    def do_GET(self) -> None:
+        if not self.authorized():
+            return
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        etag = self.server.etag
+        if url.path == "/health":
+            self.sendJson(200, {"version": self.server.version})
+            return
+        if url.path == "/call":
+            calls = [{"method": query.get("method", ""), "args": json.loads(query.get("args", "[]")),
+                      "kwargs": json.loads(query.get("kwargs", "{}"))}]
+        elif url.path == "/batch":
+            calls = json.loads(query.get("calls", "[]"))
+        else:
+            self.sendJson(404, {"error": f"Unknown path: {url.path}"})
+            return
+        if any(call.get("method") not in READ_METHODS for call in calls):
+            self.sendJson(405, {"error": "Only read methods can be called with GET"})
+            return
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.respond(url.path, calls, False, etag)
+
+    def do_POST(self) -> None:
+        if not self.authorized():
+            return
+        url = urlsplit(self.path)
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError:
+            self.sendJson(400, {"error": "Invalid JSON"})
+            return
+        if url.path == "/call":
+            self.respond(url.path, [body], False)
+        elif url.path == "/batch":
+            self.respond(url.path, body.get("calls", []), bool(body.get("transaction")))
+        else:
+            self.sendJson(404, {"error": f"Unknown path: {url.path}"})
+
+    def respond(self, path: str, calls: list[dict], transaction: bool, etag: str | None = None) -> None:
+        try:
+            results, events = self.server.run(calls, transaction)
+        except KeyError as e:
+            self.sendJson(404, {"error": f"Unknown method: {e}"})
+            return
+        except (TypeError, ValueError) as e:
+            self.sendJson(400, {"error": str(e)})
+            return
+        except Exception as e:
+            logger.error(f"Request failed: {e}")
+            self.sendJson(500, {"error": str(e)})
+            return
+        if path == "/call":
+            self.sendJson(200, {"result": results[0], "events": events}, etag)
+        else:
+            self.sendJson(200, {"results": results, "events": events}, etag)
+
+
+def main(args: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve the inventory database over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--token", help="Shared token clients must send, the token of the server section of config.json by default")
+    options = parser.parse_args(args)
+    config = loadConfig()
+    token = options.token or config.get("server", {}).get("token")
+    if token is None and options.host not in ("127.0.0.1", "localhost", "::1"):
+        logger.warning(f"Serving on {options.host} without a token, everyone on the network can change the inventory")
+    db = Database.fromConfig(config)
+    if not db.connect():
+        raise SystemExit(1)
+    server = InventoryServer(db, (options.host, options.port), token)
+    logger.info(f"Serving on http://{options.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
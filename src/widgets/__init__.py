@@ -7,4 +7,6 @@ from .popups import ChangeComponentLocation  # noqa: F401
 from .popups import ChangeComponent  # noqa: F401
 from .popups import ChangeLocation  # noqa: F401
 from .componentList import ComponentList  # noqa: F401
-from .locationList import LocationList  # noqa: F401
\ No newline at end of file
+from .componentList import ComponentToSort  # noqa: F401
+from .locationList import LocationList  # noqa: F401
+from .locationList import LocationToSort  # noqa: F401
\ No newline at end of file
@@ -13,8 +13,9 @@ class ComponentInfo(ctk.CTkFrame):
     def __init__(self, master: ctk.CTk, component: Component) -> None:
         super().__init__(master, width=132)
         self.component = component
-        if self.component.image:
-            self.image = ctk.CTkImage(self.component.image, size=(64, 64))
+        thumbnail = self.component.thumbnail(64)
+        if thumbnail:
+            self.image = ctk.CTkImage(thumbnail, size=(64, 64))
         else:
             self.image = None
         self.args = {"padx": 5, "sticky": "nw"}
@@ -12,21 +12,23 @@ if TYPE_CHECKING:
 
 logger = getLogger(__name__)
 
+# Number of components fetched per page
+PAGE_SIZE = 50
+
 
 class ComponentToSort(Component):
-    def __init__(self, component: Component) -> None:
+    def __init__(self, component: Component, quantity: int, totalPrice: float) -> None:
         super().__init__(
                             id=component.id,
                             name=component.name,
                             description=component.description,
                             price=component.price,
-                            image=component.image,
                             imagePath=component.imagePath,
                             datasheetPath=component.datasheetPath,
                             locations=component.locations
                         )
-        self.quantity = sum([quantity for _, quantity in self.locations])
-        self.totalPrice = self.price * self.quantity
+        self.quantity = quantity
+        self.totalPrice = totalPrice
 
 
 class ComponentWidget(ctk.CTkFrame):
@@ -34,8 +36,10 @@ class ComponentWidget(ctk.CTkFrame):
         super().__init__(parent)
         self.component = component
         self.icons = icons
-        if self.component.image:
-            self.image = ctk.CTkImage(self.component.image, size=(64, 64))
+        # Missing thumbnails are rendered in the background and shown by showThumbnail
+        thumbnail = self.component.thumbnail(64, render=False)
+        if thumbnail:
+            self.image = ctk.CTkImage(thumbnail, size=(64, 64))
         else:
             self.image = None
         self.master: App = master
@@ -68,6 +72,13 @@ class ComponentWidget(ctk.CTkFrame):
         self.changeButon = ctk.CTkButton(self, text="", image=self.icons["edit-pencil"], width=28, command=self.change)
         self.changeButon.grid(row=0, column=6, **args)
 
+    def showThumbnail(self) -> None:
+        thumbnail = self.component.thumbnail(64, render=False)
+        if thumbnail is None:
+            return
+        self.image = ctk.CTkImage(thumbnail, size=(64, 64))
+        self.imageLabel.configure(image=self.image)
+
     def change(self) -> None:
         logger.info(f"Changing component {self.component.name}")
         self.popup = ChangeComponent(self.component, self.db, self)
@@ -87,54 +98,126 @@ class ComponentWidget(ctk.CTkFrame):
 
 
 class ComponentList(ctk.CTkScrollableFrame):
-    def __init__(self, parent: ctk.CTkBaseClass, icons: dict[str, ctk.CTkImage], components: list[Component], master, sorting: str, search: str="") -> None:
+    def __init__(self, parent: ctk.CTkBaseClass, icons: dict[str, ctk.CTkImage], master, sorting: str, search: str="", pageSize: int=PAGE_SIZE) -> None:
         super().__init__(parent)
         self.icons = icons
         self.master: App = master
+        self.pageSize = pageSize
         self.sortedComponent: list[ComponentToSort] = []
         self.componentWidgets: list[ComponentWidget] = []
-        self.refresh(components, sorting, search)
+        self.widgetsById: dict[int, ComponentWidget] = {}
+        self.cursor: tuple | None = None
+        self.loadMoreButton: ctk.CTkButton | None = None
+        self.loadingLabel: ctk.CTkLabel | None = None
+        self.refresh(sorting, search)
 
-    def refresh(self, components: list[Component], sorting: str, search: str) -> None:
-        self.components = [ComponentToSort(component) for component in components]
+    def refresh(self, sorting: str, search: str) -> None:
         self.sorting = sorting
         self.search = search if search else None
-        self.sortComponents()
-        self.filterComponents()
-        self.createWidgets()
-
-    def sortComponents(self) -> None:
-        if self.sorting == "Name":
-            self.sortedComponent = sorted(self.components, key=lambda x: x.name)
-        elif self.sorting == "Price":
-            self.sortedComponent = sorted(self.components, key=lambda x: x.price)
-        elif self.sorting == "Quantity":
-            self.sortedComponent = sorted(self.components, key=lambda x: x.quantity)
-        elif self.sorting == "Total Price":
-            self.sortedComponent = sorted(self.components, key=lambda x: x.totalPrice)
-        else:
-            raise ValueError("Invalid sorting value")
+        self.sortedComponent = []
+        self.cursor = None
+        self.master.components.clear()
+        self.clearWidgets()
+        self.loadPage()
+
+    def loadPage(self, *args) -> None:
+        if self.loadMoreButton:
+            self.loadMoreButton.grid_remove()
+        if not self.loadingLabel:
+            self.loadingLabel = ctk.CTkLabel(self, text="Loading...")
+        self.loadingLabel.grid(row=len(self.componentWidgets)+1, column=1, sticky="nw", pady=5)
+        self.master.worker.run(
+            self, self.queryPage, self.sorting, self.search or "", self.cursor,
+            callback=self.addPage,
+            key="componentList"
+        )
+
+    def queryPage(self, sorting: str, search: str, cursor: tuple | None) -> tuple[list[ComponentToSort], tuple | None]:
+        # Runs on the database worker thread, no Tk calls here
+        components, cursor = self.master.db.queryComponents(sorting, search, after=cursor, limit=self.pageSize)
+        return [ComponentToSort(component, quantity, totalPrice) for component, quantity, totalPrice in components], cursor
+
+    def addPage(self, result: tuple[list[ComponentToSort], tuple | None]) -> None:
+        page, self.cursor = result
+        if self.loadingLabel:
+            self.loadingLabel.grid_remove()
+        for component in page:
+            if component.id is not None:
+                self.master.components[component.id] = component
+        self.sortedComponent.extend(page)
+        self.createWidgets(page)
+
+    def clearWidgets(self) -> None:
+        for widget in self.winfo_children():
+            widget.destroy()
+        self.componentWidgets.clear()
+        self.widgetsById.clear()
+        self.loadMoreButton = None
+        self.loadingLabel = None
 
-    def filterComponents(self) -> None:
+    def createWidgets(self, page: list[ComponentToSort]) -> None:
         if len(self.sortedComponent) == 0:
             logger.warning("No components to display")
             return
-        if self.search is None:
+        if not self.componentWidgets:
+            self.createHeader()
+        for component in page:
+            widget = ComponentWidget(self, component, self.icons, self.master)
+            widget.grid(row=len(self.componentWidgets)+1, sticky="nw", columnspan=6, pady=5)
+            self.componentWidgets.append(widget)
+            if component.id is not None:
+                self.widgetsById[component.id] = widget
+        if self.cursor is None:
+            if self.loadMoreButton:
+                self.loadMoreButton.destroy()
+                self.loadMoreButton = None
             return
-        toRemove: list[ComponentToSort] = []
-        for component in self.sortedComponent:
-            if self.search.lower() not in component.name.lower():
-                toRemove.append(component)
-        for component in toRemove:
-            self.sortedComponent.remove(component)
-
-    def createWidgets(self) -> None:
+        if not self.loadMoreButton:
+            self.loadMoreButton = ctk.CTkButton(self, text="Load more", command=self.loadPage)
+        self.loadMoreButton.grid(row=len(self.componentWidgets)+1, column=1, sticky="nw", pady=5)
+
+    def updateComponent(self, component: ComponentToSort) -> None:
+        """
+        Redraws the row of a changed component, new components are appended once every page is loaded.
+        """
+        if component.id is None:
+            return
+        old = self.widgetsById.get(component.id)
+        if old is None:
+            # Unloaded pages and search results pick the component up on the next refresh
+            if self.cursor is not None or self.search is not None:
+                return
+            self.sortedComponent.append(component)
+            self.master.components[component.id] = component
+            self.createWidgets([component])
+            return
+        self.sortedComponent = [component if c.id == component.id else c for c in self.sortedComponent]
+        self.master.components[component.id] = component
+        widget = ComponentWidget(self, component, self.icons, self.master)
+        widget.grid(**old.grid_info())
+        index = self.componentWidgets.index(old)
+        self.componentWidgets[index] = widget
+        self.widgetsById[component.id] = widget
+        old.destroy()
+
+    def showThumbnails(self, paths: set[str]) -> None:
+        """
+        Shows the images of the rows whose thumbnails were rendered in the background.
+        """
         for widget in self.componentWidgets:
-            widget.destroy()
-        self.componentWidgets.clear()
-        if len(self.sortedComponent) == 0:
-            logger.warning("No components to display")
+            if widget.image is None and widget.component.imagePath in paths:
+                widget.showThumbnail()
+
+    def removeComponent(self, componentID: int) -> None:
+        widget = self.widgetsById.pop(componentID, None)
+        self.master.components.pop(componentID, None)
+        self.sortedComponent = [c for c in self.sortedComponent if c.id != componentID]
+        if widget is None:
             return
+        self.componentWidgets.remove(widget)
+        widget.destroy()
+
+    def createHeader(self) -> None:
         self.columnconfigure(0, minsize=100)
         self.columnconfigure(1, minsize=200)
         self.columnconfigure(2, minsize=100)
@@ -152,7 +235,3 @@ class ComponentList(ctk.CTkScrollableFrame):
         self.quantityLabel.grid(row=0, column=4, **args)
         self.descriptionLabel = ctk.CTkLabel(self, text="Description")
         self.descriptionLabel.grid(row=0, column=5, **args)
-        for row, component in enumerate(self.sortedComponent):
-            widget = ComponentWidget(self, component, self.icons, self.master)
-            widget.grid(row=row+1, sticky="nw", columnspan=6, pady=5)
-            self.componentWidgets.append(widget)
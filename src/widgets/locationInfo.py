@@ -20,7 +20,7 @@ class LocationInfo(ctk.CTkFrame):
         self.closeButton.grid(row=0, column=0, sticky="ne")
         self.idLabel = ctk.CTkLabel(self, text=f"ID: {self.location.id}")
         self.idLabel.grid(row=0, column=0, **self.args)
-        self.parentLabel = ctk.CTkLabel(self, text=f"Parent: {self.location.parentID}")
+        self.parentLabel = ctk.CTkLabel(self, text="Path: ...")
         self.parentLabel.grid(row=1, column=0, **self.args)
         self.nameLabel = ctk.CTkLabel(self, text=f"Name: {self.location.name}|{self.location.shortName}")
         self.nameLabel.grid(row=2, column=0, **self.args)
@@ -28,3 +28,18 @@ class LocationInfo(ctk.CTkFrame):
         self.descriptionTextbox.insert("1.0", self.location.description)
         self.descriptionTextbox.configure(state="disabled")
         self.descriptionTextbox.grid(row=3, column=0, **self.args)
+        self.totalLabel = ctk.CTkLabel(self, text="")
+        self.totalLabel.grid(row=4, column=0, **self.args)
+        if self.location.id is not None:
+            self.master.worker.run(self, self.queryTree, self.location.id, callback=self.showTree)  # type: ignore
+
+    def queryTree(self, locationID: int) -> tuple[str, tuple[int, float]]:
+        # Runs on the database worker thread, no Tk calls here
+        db = self.master.db  # type: ignore
+        totals = db.getSubtreeTotals([locationID])
+        return db.getLocationPath(locationID), (totals[0][1], totals[0][2]) if totals else (0, 0.0)
+
+    def showTree(self, tree: tuple[str, tuple[int, float]]) -> None:
+        path, (quantity, totalPrice) = tree
+        self.parentLabel.configure(text=f"Path: {path}")
+        self.totalLabel.configure(text=f"Total: {quantity} | {totalPrice:.2f}€")
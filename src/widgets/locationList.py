@@ -8,22 +8,22 @@ from src.widgets import ChangeLocation
 
 if TYPE_CHECKING:
     from src.app import App
-from src.component import Component
+
 
 logger = getLogger(__name__)
 
 
 class LocationToSort(Location):
-    def __init__(self, location: Location, components: list[Component]) -> None:
+    def __init__(self, location: Location, quantity: int, totalPrice: float) -> None:
         super().__init__(
                             id=location.id,
+                            parentID=location.parentID,
                             name=location.name,
                             shortName=location.shortName,
                             description=location.description,
                         )
-        self.components = components
-        self.quantity = sum([quantity for component in self.components for locationId, quantity in component.locations if locationId == location.id])
-        self.totalPrice = sum([component.price * quantity for component in self.components for locationId, quantity in component.locations if locationId == location.id])
+        self.quantity = quantity
+        self.totalPrice = totalPrice
 
 
 class LocationWidget(ctk.CTkFrame):
@@ -83,17 +83,34 @@ class LocationList(ctk.CTkScrollableFrame):
         self.master: App = master
         self.sortedComponent: list[LocationToSort] = []
         self.locationWidgets: list[LocationWidget] = []
+        self.widgetsById: dict[int, LocationWidget] = {}
+        self.locations: list[LocationToSort] = []
+        self.matches: set[int] | None = None
+        self.loadingLabel = ctk.CTkLabel(self, text="Loading...")
         self.refresh(locations, sorting, search)
 
     def refresh(self, locations: list[Location], sorting: str, search: str="") -> None:
-        self.locations: list[LocationToSort] = []
-        for location in locations:
-            if location.id is not None:
-                self.locations.append(LocationToSort(location, self.master.db.getComponentsInLocation(location.id)))
-            else:
-                self.locations.append(LocationToSort(location, []))
         self.sorting = sorting
         self.search = search if search else None
+        self.loadingLabel.grid(row=len(self.locationWidgets)+1, column=0, sticky="nw", pady=5)
+        self.master.worker.run(
+            self, self.queryTotals, len(locations), self.search,
+            callback=lambda data: self.display(locations, *data),
+            key="locationList"
+        )
+
+    def queryTotals(self, limit: int, search: str | None) -> tuple[dict[int, tuple[int, float]], set[int] | None]:
+        # Runs on the database worker thread, no Tk calls here
+        totals = {locationId: (quantity, totalPrice) for locationId, quantity, totalPrice in self.master.db.getLocationTotals()}
+        if search is None:
+            return totals, None
+        hits = self.master.db.search(search, limit, kind="location")
+        return totals, {locationId for _, locationId, _, _ in hits}
+
+    def display(self, locations: list[Location], totals: dict[int, tuple[int, float]], matches: set[int] | None) -> None:
+        self.loadingLabel.grid_remove()
+        self.locations: list[LocationToSort] = [LocationToSort(location, *totals.get(location.id, (0, 0.0))) for location in locations]  # type: ignore
+        self.matches = matches
         self.sortLocations()
         self.filterLocations()
         self.createWidgets()
@@ -114,17 +131,15 @@ class LocationList(ctk.CTkScrollableFrame):
             return
         if self.search is None:
             return
-        toRemove: list[LocationToSort] = []
-        for location in self.sortedLocations:
-            if self.search.lower() not in location.name.lower() and self.search.lower() not in location.shortName.lower():
-                toRemove.append(location)
-        for location in toRemove:
-            self.sortedLocations.remove(location)
+        if self.matches is None:
+            return
+        self.sortedLocations = [location for location in self.sortedLocations if location.id in self.matches]
 
     def createWidgets(self) -> None:
         for widget in self.locationWidgets:
             widget.destroy()
         self.locationWidgets.clear()
+        self.widgetsById.clear()
         if len(self.sortedLocations) == 0:
             logger.warning("No locations to display")
             return
@@ -148,3 +163,40 @@ class LocationList(ctk.CTkScrollableFrame):
             widget = LocationWidget(self, location, self.icons, self.master)
             widget.grid(row=row+1, sticky="nw", columnspan=5, pady=5)
             self.locationWidgets.append(widget)
+            if location.id is not None:
+                self.widgetsById[location.id] = widget
+
+    def updateLocation(self, location: LocationToSort) -> None:
+        """
+        Redraws the row of a changed location, new locations are appended to the end.
+        """
+        if location.id is None:
+            return
+        self.locations = [loc for loc in self.locations if loc.id != location.id] + [location]
+        old = self.widgetsById.get(location.id)
+        if old is None:
+            # A search result list picks the location up on the next refresh
+            if self.search is not None:
+                return
+            if not self.locationWidgets:
+                self.sortLocations()
+                self.createWidgets()
+                return
+            widget = LocationWidget(self, location, self.icons, self.master)
+            widget.grid(row=len(self.locationWidgets)+1, sticky="nw", columnspan=5, pady=5)
+            self.locationWidgets.append(widget)
+            self.widgetsById[location.id] = widget
+            return
+        widget = LocationWidget(self, location, self.icons, self.master)
+        widget.grid(**old.grid_info())
+        self.locationWidgets[self.locationWidgets.index(old)] = widget
+        self.widgetsById[location.id] = widget
+        old.destroy()
+
+    def removeLocation(self, locationID: int) -> None:
+        self.locations = [loc for loc in self.locations if loc.id != locationID]
+        widget = self.widgetsById.pop(locationID, None)
+        if widget is None:
+            return
+        self.locationWidgets.remove(widget)
+        widget.destroy()
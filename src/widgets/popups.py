@@ -4,10 +4,11 @@ from pathlib import Path
 import customtkinter as CTk
 import tkinter.messagebox as tkMessageBox
 import tkinter.filedialog as tkfd
-from PIL import Image
 
+from .. import blobs
 from ..database import Database
 from ..component import Component
+from ..images import loadImage
 from ..location import Location
 
 
@@ -89,43 +90,48 @@ class Popup(CTk.CTkToplevel):
         widget.delete(0, "end")
         widget.insert(0, f"{price:.2f} €")
 
-    def createImageDialog(self, master) -> None:
-        master.imageDialog = tkfd.askopenfiles(mode="r", filetypes=[("Image Files", "*.png *.jpg *.jpeg *.bmp")], title="Select Image", initialdir=".")
+    def storeFile(self, path: Path) -> Path | None:
+        """
+        Adds a selected file to the blob store, returns the path to reference it by.
+        """
+        if blobs.blobStore is None:
+            return path
         try:
-            imgPath = Path(master.imageDialog[0].name)
-        except Exception as e:
-            logger.warning("No image selected")
+            return blobs.blobStore.add(path)
+        except OSError as e:
+            logger.error(f"Failed to store file: {path}")
             logger.debug(e)
+            tkMessageBox.showerror("Error", f"Failed to store file \"{path.name}\"", parent=self)
+            return None
+
+    def createImageDialog(self, master) -> None:
+        name = tkfd.askopenfilename(filetypes=[("Image Files", "*.png *.jpg *.jpeg *.bmp")], title="Select Image", initialdir=".")
+        if not name:
+            logger.warning("No image selected")
+            return
+        imgPath = self.storeFile(Path(name))
+        if imgPath is None:
             return
-        image = Image.open(imgPath)
-        # Check if its a premade image
-        if len(list(master.master.preMadePath.glob(imgPath.name))) == 0:  # type: ignore
-            master.imagePath = master.master.imgPath / imgPath.name  # type: ignore
-            # Check if the image is allready in the image folder
-            if Path(imgPath) != master.imagePath:
-                image.save(master.imagePath)
-        ctkImage = CTk.CTkImage(image, size=(100, 100))
-        master.image = CTk.CTkLabel(master, text="", image=ctkImage)
-        master.image.grid(row=4, column=2, sticky="ne")
+        master.imagePath = imgPath
+        thumbnail = loadImage(imgPath, (100, 100))
+        if thumbnail:
+            ctkImage = CTk.CTkImage(thumbnail, size=(100, 100))
+            master.image = CTk.CTkLabel(master, text="", image=ctkImage)
+            master.image.grid(row=4, column=2, sticky="ne")
         master.imageEntry.delete(0, "end")
-        master.imageEntry.insert("end", imgPath)
+        master.imageEntry.insert("end", str(imgPath))
 
     def createDatasheetDialog(self, master) -> None:
-        master.datasheetDialog = tkfd.askopenfiles(mode="r", filetypes=[("PDF Files", "*.pdf")], title="Select Datasheet", initialdir=".")
-        try:
-            name = master.datasheetDialog[0].name
-        except Exception as e:
+        name = tkfd.askopenfilename(filetypes=[("PDF Files", "*.pdf")], title="Select Datasheet", initialdir=".")
+        if not name:
             logger.warning("No datasheet selected")
-            logger.debug(e)
             return
-        with open(name, "rb") as f:
-            doc = f.readlines()
-        master.datasheetPath = master.master.docsPath / Path(name).name  # type: ignore
-        if isinstance(master.datasheetPath, Path) and master.datasheetPath.exists():
-            with open(master.datasheetPath, "wb") as f:
-                f.writelines(doc)
+        datasheetPath = self.storeFile(Path(name))
+        if datasheetPath is None:
+            return
+        master.datasheetPath = datasheetPath
         master.datasheetEntry.delete(0, "end")
-        master.datasheetEntry.insert("end", name)
+        master.datasheetEntry.insert("end", str(datasheetPath))
 
 
 class AddComponentLocation(Popup):
@@ -135,9 +141,10 @@ class AddComponentLocation(Popup):
     def createWidgets(self) -> None:
         self.componentLabel = CTk.CTkLabel(self, text="Component: ")
         self.componentLabel.grid(row=0, column=0, sticky="e")
-        self.componentValues = [f"[{component.id}] {component.name}" for component in self.db.getComponents()]
+        self.componentValues: list[str] = []
         self.componentVar = CTk.StringVar(self)
-        self.componentOptionMenu = CTk.CTkOptionMenu(self, variable=self.componentVar, values=self.componentValues, command=self.refreshCurrentAmount)
+        self.componentOptionMenu = CTk.CTkOptionMenu(self, variable=self.componentVar, values=["Loading..."], command=self.refreshCurrentAmount)
+        self.master.worker.run(self, self.db.getComponents, callback=self.setComponentValues)  # type: ignore
         self.componentOptionMenu.bind("<FocusOut>", self.refreshCurrentAmount)
         self.componentOptionMenu.grid(row=0, column=1)
         self.locationLabel = CTk.CTkLabel(self, text="Location: ")
@@ -160,6 +167,10 @@ class AddComponentLocation(Popup):
         self.addButton = CTk.CTkButton(self, text="Add", command=self.add)
         self.addButton.grid(row=4, column=1)
 
+    def setComponentValues(self, components: list[Component]) -> None:
+        self.componentValues = [f"[{component.id}] {component.name}" for component in components]
+        self.componentOptionMenu.configure(values=self.componentValues)
+
     def refreshCurrentAmount(self, *args) -> None:
         componentId = self.getIdFromStr(self.componentVar.get())
         locationId = self.getIdFromStr(self.locationVar.get())
@@ -190,15 +201,9 @@ class AddComponentLocation(Popup):
             self.amountEntry.focus_set()
             self.amountEntry.configure(fg_color="red")
             return
-        componentLocation = {
-            "componentID": componentId,
-            "locationID": locationId,
-            "amount": amount
-        }
-        if not self.db.addComponentToLocation(**componentLocation):
-            if not self.db.createComponentLocationMap(**componentLocation):
-                logger.error("Failed to add component to location")
-                return
+        if self.db.adjustStock(componentId, locationId, amount) < 0:
+            logger.error("Failed to add component to location")
+            return
         logger.debug(f"Adding component to location, \"{self.componentVar.get()}\" to \"{self.locationVar.get()}\", amount: {self.amountEntry.get()}")
         self.destroyFunc()
 
@@ -382,11 +387,14 @@ class ChangeComponentLocation(Popup):
         if self.component.id is None or self.location.id is None:
             logger.error("Invalid id")
             return
-        currentAmount = self.db.getComponentAmountInLocation(self.component.id, self.location.id)
-        if not currentAmount:
-            logger.error("Failed to get current amount")
-            return
-        if not self.db.removeComponentFromLocation(self.component.id, self.location.id, currentAmount):
+        with self.db.transaction():
+            currentAmount = self.db.getComponentAmountInLocation(self.component.id, self.location.id)
+            if not currentAmount:
+                logger.error("Failed to get current amount")
+                return
+            # None from a server, which sends the removal when the transaction ends
+            removed = self.db.removeComponentFromLocation(self.component.id, self.location.id, currentAmount)
+        if removed is False:
             logger.error("Failed to remove component from location")
             return
         logger.debug(f"Removing component from location, \"{self.component.name}\" from \"{self.location.name}\"")
@@ -402,12 +410,8 @@ class ChangeComponentLocation(Popup):
             self.changeAmountEntry.focus_set()
             self.changeAmountEntry.configure(fg_color="red")
             return
-        elif amount < 0:
-            self.db.removeComponentFromLocation(self.component.id, self.location.id, abs(amount))
-        elif amount > 0:
-            self.db.addComponentToLocation(self.component.id, self.location.id, amount)
-        else:
-            logger.error("Invalid amount")
+        if self.db.adjustStock(self.component.id, self.location.id, amount) < 0:
+            logger.error("Failed to change component amount in location")
             return
         logger.debug(f"Changing component amount in location, \"{self.component.name}\" in \"{self.location.name}\", amount: {amount}")
         self.destroyFunc()
@@ -458,9 +462,9 @@ class ChangeComponent(Popup):
         self.imageEntry.grid(row=0, column=3)
         self.imageButton = CTk.CTkButton(self, text="Select Image", command=lambda: self.createImageDialog(self))
         self.imageButton.grid(row=0, column=4)
-        if self.component.imagePath:
-            image = Image.open(self.component.imagePath)
-            ctkImage = CTk.CTkImage(image, size=(100, 100))
+        thumbnail = self.component.thumbnail(100)
+        if thumbnail:
+            ctkImage = CTk.CTkImage(thumbnail, size=(100, 100))
             self.image = CTk.CTkLabel(self, text="", image=ctkImage)
             self.image.grid(row=1, column=2, sticky="ne", rowspan=2)
         self.datasheetLabel = CTk.CTkLabel(self, text="Datasheet: ")
@@ -0,0 +1,111 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from logging import getLogger
+from typing import Any, Callable
+
+from src.database import Database
+
+
+logger = getLogger(__name__)
+
+# Milliseconds between checks if a request is done
+POLL_INTERVAL = 20
+
+
+class DatabaseWorker:
+    """
+    Runs Database calls on a background thread so the Tk main loop never waits for a query.
+
+    Requests are executed one after another in submission order. Requests submitted
+    with a key replace older requests with the same key: a pending one is cancelled
+    and the result of a running one is dropped.
+
+    Attributes:
+        db (Database): The database the requests run against.
+    """
+
+    def __init__(self, db: Database) -> None:
+        self.db = db
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="database")
+        self._latest: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable | str, *args, key: str | None = None, **kwargs) -> Future:
+        """
+        Queues a call on the worker thread.
+
+        Args:
+            func (Callable | str): The function to call, or the name of a Database method.
+            *args: The positional arguments of the call.
+            key (str | None): Cancels older requests with the same key, e.g. an outdated search.
+            **kwargs: The keyword arguments of the call.
+
+        Returns:
+            Future: The future of the result.
+        """
+        if isinstance(func, str):
+            func = getattr(self.db, func)
+        future = self._executor.submit(func, *args, **kwargs)
+        if key is not None:
+            with self._lock:
+                previous = self._latest.get(key)
+                self._latest[key] = future
+            if previous is not None and previous.cancel():
+                logger.debug(f"Cancelled stale request \"{key}\"")
+        return future
+
+    def isStale(self, future: Future, key: str | None) -> bool:
+        """
+        Returns whether a newer request with the same key was submitted.
+        """
+        if future.cancelled():
+            return True
+        if key is None:
+            return False
+        with self._lock:
+            return self._latest.get(key) is not future
+
+    def deliver(self, widget, future: Future, callback: Callable[[Any], None], key: str | None = None,
+                onError: Callable[[BaseException], None] | None = None) -> None:
+        """
+        Calls callback with the result on the Tk main loop once the future is done.
+
+        The main loop polls the future with widget.after, so Tk is only used from its own thread.
+        Nothing is called for stale requests or when the widget was destroyed.
+
+        Args:
+            widget: The Tk widget whose main loop runs the callback.
+            future (Future): The future returned by submit.
+            callback (Callable[[Any], None]): Called with the result.
+            key (str | None): The key the request was submitted with.
+            onError (Callable[[BaseException], None] | None): Called with the exception if the request failed.
+        """
+        def poll() -> None:
+            if not widget.winfo_exists():
+                return
+            if not future.done():
+                widget.after(POLL_INTERVAL, poll)
+                return
+            if self.isStale(future, key):
+                logger.debug(f"Dropped stale result of \"{key}\"")
+                return
+            error = future.exception()
+            if error is not None:
+                logger.error(f"Database request failed: {error}")
+                if onError:
+                    onError(error)
+                return
+            callback(future.result())
+
+        widget.after(0, poll)
+
+    def run(self, widget, func: Callable | str, *args, callback: Callable[[Any], None], key: str | None = None, **kwargs) -> Future:
+        """
+        Submits a call and delivers its result to callback on the Tk main loop.
+        """
+        future = self.submit(func, *args, key=key, **kwargs)
+        self.deliver(widget, future, callback, key)
+        return future
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
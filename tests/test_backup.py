@@ -0,0 +1,42 @@
+import zipfile
+
+from src.backup import createBackup, restoreBackup, verifyBackup
+from src.component import Component
+from src.database import Database
+from src.location import Location
+
+
+def test_backupAndRestore(tmp_path):
+    datasheet = tmp_path / "docs" / "r1.pdf"
+    datasheet.parent.mkdir()
+    datasheet.write_bytes(b"datasheet")
+    db = Database(f"sqlite:///{tmp_path / 'stash.db'}", profile="fast")
+    assert db.connect() is True
+    db.createComponent(Component("R1", datasheetPath=datasheet))
+    db.createLocation(Location("Box"))
+    db.adjustStock(1, 1, 5)
+
+    steps = []
+    first = createBackup(db, tmp_path / "backups", progress=lambda remaining, total: steps.append(remaining))
+    assert first is not None and steps[-1] == 0
+    assert verifyBackup(first) is True
+    assert zipfile.ZipFile(first).namelist() == ["database.db", "manifest.json"]
+    # Unchanged files are stored once
+    second = createBackup(db, tmp_path / "backups")
+    assert second is not None and second != first
+    assert len([path for path in (tmp_path / "backups" / "blobs").rglob("*") if path.is_file()]) == 1
+
+    db.adjustStock(1, 1, 10)
+    datasheet.write_bytes(b"changed")
+    target = tmp_path / "restored.db"
+    assert restoreBackup(first, target) is True
+    restored = Database(f"sqlite:///{target}")
+    assert restored.connect() is True
+    assert restored.getComponentAmountInLocation(1, 1) == 5
+    assert datasheet.read_bytes() == b"datasheet"
+
+    # A damaged blob fails the verification and nothing is restored
+    next((tmp_path / "backups" / "blobs").rglob("*/*")).write_bytes(b"broken")
+    assert verifyBackup(second) is False
+    assert restoreBackup(second, tmp_path / "other.db") is False
+    assert not (tmp_path / "other.db").exists()
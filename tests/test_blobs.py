@@ -0,0 +1,49 @@
+import os
+
+from src.blobs import CHUNK_SIZE, BlobStore, hashFile
+from src.component import Component
+from src.database import Database
+
+
+def test_blobStore(tmp_path):
+    db = Database(f"sqlite:///{tmp_path / 'blobs.db'}", profile="fast")
+    assert db.connect() is True
+    store = BlobStore(tmp_path / "blobs")
+    (tmp_path / "vendorA").mkdir()
+    (tmp_path / "vendorB").mkdir()
+    datasheet = tmp_path / "vendorA" / "LM358.PDF"
+    datasheet.write_bytes(os.urandom(CHUNK_SIZE * 2 + 17))
+    same = tmp_path / "vendorB" / "lm358-copy.pdf"
+    same.write_bytes(datasheet.read_bytes())
+    other = tmp_path / "vendorB" / "LM358.pdf"
+    other.write_bytes(b"another vendor")
+
+    blob = store.add(datasheet)
+    assert blob == store.blobPath(hashFile(datasheet), ".pdf") and blob.parent.name == blob.name[:2]
+    assert blob.read_bytes() == datasheet.read_bytes()
+    # Identical content is stored once, same names don't collide
+    assert store.add(same) == blob and store.add(blob) == blob
+    otherBlob = store.add(other)
+    assert otherBlob != blob
+    assert len(list((tmp_path / "blobs").rglob("*.*"))) == 2
+
+    db.createComponents([Component("LM358", datasheetPath=blob), Component("LM358 DIP", datasheetPath=blob)])
+    assert store.references(db) == {blob: 2, otherBlob: 0}
+    assert store.collectGarbage(db) == 0
+    assert store.collectGarbage(db, grace=0) == 1
+    assert blob.is_file() and not otherBlob.exists()
+    assert db.getFileReferences() == {str(blob): 2}
+    assert db.getImagePaths() == []
+
+    # A failed read of the references removes nothing
+    references = db.getFileReferences
+    db.getFileReferences = lambda: None  # type: ignore
+    assert store.collectGarbage(db, grace=0) == 0
+    db.getFileReferences = references  # type: ignore
+
+    # Blobs of the last referencing components are removed with them
+    for component in db.getComponents():
+        assert db.deleteComponent(component) is True
+    assert db.getFileReferences() == {}
+    assert store.collectGarbage(db, grace=0) == 1
+    assert not blob.exists()
@@ -0,0 +1,86 @@
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+from src.cli import main
+from src.component import Component
+from src.database import Database
+from src.location import Location
+from src.server import InventoryServer
+
+
+ROOT = Path(__file__).parent.parent
+
+
+def runPython(code: str) -> list[str]:
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+def test_cli(tmp_path, capsys):
+    url = f"sqlite:///{tmp_path / 'cli.db'}"
+    db = Database(url)
+    assert db.connect() is True
+    db.createComponents([Component("NE555", price=0.5), Component("LM358", price=0.25)])
+    db.createLocation(Location("Shelf"))
+    db.createLocation(Location("Box", parentID=1))
+
+    assert main(["--database", url, "stock", "add", "NE555", "Shelf", "10"]) == 0
+    assert main(["--database", url, "stock", "move", "1", "Shelf", "Box", "4"]) == 0
+    assert main(["--database", url, "stock", "remove", "NE555", "2", "1"]) == 0
+    assert capsys.readouterr().out.split("\n")[:3] == ["10", "6\t4", "3"]
+    assert main(["--database", url, "stock", "move", "1", "Shelf", "Box", "7"]) == 1
+    assert main(["--database", url, "stock", "add", "TL071", "Shelf", "1"]) == 1
+    assert db.getComponentAmountInLocation(1, 1) == 6
+
+    # A numeric barcode is a name first, #ID is always an ID
+    db.createComponent(Component("4006381333931"))
+    capsys.readouterr()
+    assert main(["--database", url, "stock", "add", "4006381333931", "Shelf", "5"]) == 0
+    assert main(["--database", url, "stock", "remove", "#3", "#1", "5"]) == 0
+    assert main(["--database", url, "stock", "add", "#4006381333931", "Shelf", "1"]) == 1
+    assert capsys.readouterr().out == "5\n0\n"
+
+    capsys.readouterr()
+    assert main(["--database", url, "search", "ne5"]) == 0
+    assert capsys.readouterr().out == "component\t1\tNE555\n"
+    assert main(["--database", url, "report", "--subtree"]) == 0
+    assert capsys.readouterr().out == "Total\t9\t4.50\nBox\t3\t1.50\nShelf\t9\t4.50\n"
+    assert main(["--database", url, "export", "stock", str(tmp_path / "stock.csv")]) == 0
+    assert main(["--database", url, "import", "stock", str(tmp_path / "stock.csv")]) == 0
+    assert capsys.readouterr().out == "2 exported\n2 imported, 0 skipped\n"
+
+
+def test_errors(tmp_path, capsys):
+    url = f"sqlite:///{tmp_path / 'cli.db'}"
+    db = Database(url)
+    assert db.connect() is True
+    (tmp_path / "noname.csv").write_text("price\n1.5\n", encoding="utf-8")
+
+    assert main(["--database", url, "import", "components", str(tmp_path / "missing.csv")]) == 1
+    assert main(["--database", url, "import", "components", str(tmp_path / "noname.csv")]) == 1
+    assert main(["--database", url, "export", "stock", str(tmp_path / "missing" / "stock.csv")]) == 1
+    assert main(["--database", "http://127.0.0.1:1", "report"]) == 1
+    errors = capsys.readouterr().err
+    assert "Can't read" in errors and "Missing column 'name'" in errors and "Can't write" in errors
+    assert "Traceback" not in errors
+
+    server = InventoryServer(db, ("127.0.0.1", 0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        assert main(["--database", f"http://127.0.0.1:{server.server_port}", "export", "stock", str(tmp_path / "stock.csv")]) == 1
+        assert "local database" in capsys.readouterr().err
+    finally:
+        server.close()
+
+
+def test_noGuiImports(tmp_path):
+    # The data layer loads neither the GUI nor Pillow
+    loaded = runPython(
+        "import sys\n"
+        "from src.cli import main\n"
+        f"main(['--database', 'sqlite:///{(tmp_path / 'gui.db').as_posix()}', 'report'])\n"
+        "print(any(name.split('.')[0] in ('tkinter', 'customtkinter', 'PIL') for name in sys.modules))"
+    )
+    assert loaded[-1] == "False"
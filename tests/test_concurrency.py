@@ -0,0 +1,58 @@
+import multiprocessing
+import sqlite3
+
+from src.component import Component
+from src.database import Database, isBusy
+from src.location import Location
+
+
+WRITERS = 4
+UPDATES = 50
+
+
+def hammer(url: str, start, results) -> None:
+    # A short busy timeout makes the writers run into the retry path
+    db = Database(url, busyTimeout=20, retries=20)
+    assert db.connect() is True
+    start.wait()
+    failed = 0
+    for i in range(UPDATES):
+        if db.adjustStock(1, 1, 2) == -1:
+            failed += 1
+        if db.addComponentToLocation(1, 2, 1) is False:
+            failed += 1
+    results.put(failed)
+    db.engine.dispose()
+
+
+def test_isBusy():
+    assert isBusy(sqlite3.OperationalError("database is locked")) is True
+    assert isBusy(sqlite3.OperationalError("no such table: components")) is False
+
+
+def test_concurrentWriters(tmp_path):
+    url = f"sqlite:///{tmp_path / 'concurrent.db'}"
+    db = Database(url)
+    assert db.connect() is True
+    db.createComponent(Component("A"))
+    db.createLocations([Location("Box"), Location("Drawer")])
+    db.createComponentLocationMap(1, 2, 1)
+    db.engine.dispose()
+
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    start = context.Event()
+    results = context.Queue()
+    processes = [context.Process(target=hammer, args=(url, start, results)) for _ in range(WRITERS)]
+    for process in processes:
+        process.start()
+    start.set()
+    failures = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    # No update was lost
+    assert failures == [0] * WRITERS
+    assert db.getComponentAmountInLocation(1, 1) == WRITERS * UPDATES * 2
+    assert db.getComponentAmountInLocation(1, 2) == WRITERS * UPDATES + 1
+    assert len(db.getMovements(1, limit=1000)) == WRITERS * UPDATES * 2 + 1
@@ -1,3 +1,8 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import event
+
 from src.database import Database
 from src.component import Component
 from src.location import Location
@@ -48,8 +53,435 @@ def test_deleteComponent():
     assert component is not None
     assert db.deleteComponent(component) is False
     assert db.deleteComponent(component, force=True) is True
+    assert db.getComponent(name="Test") is None
 
 def test_deleteLocation():
     location = db.getLocation(name="Test")
     assert location is not None
     assert db.deleteLocation(location) is True
+
+
+def test_forceDelete(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'delete.db'}")
+    assert database.connect() is True
+    database.createComponents([Component("A"), Component("B")])
+    database.createLocation(Location("Shelf"))
+    database.createComponentLocationMap(1, 1, 5)
+    database.createComponentLocationMap(2, 1, 3)
+
+    assert database.deleteComponent(database.getComponent(1), force=True) is True  # type: ignore
+    assert database.getComponent(1) is None and database.getComponent(name="A") is None
+    assert database.getComponentAmountInLocation(1, 1) == -1
+    assert database.deleteLocation(database.getLocation(1), force=True) is True  # type: ignore
+    assert database.getLocation(1) is None and database.getLocations() == []
+    assert database.getComponentAmountInLocation(2, 1) == -1
+    assert [component.name for component in database.getComponents()] == ["B"]
+
+
+def createInventory(database: Database, size: int) -> None:
+    for i in range(size):
+        database.createLocation(Location(f"Location {i}", shortName=f"L{i}"))
+        database.createComponent(Component(f"Component {i}", price=1.0))
+    for i in range(size):
+        database.createComponentLocationMap(i + 1, i + 1, 1)
+        database.createComponentLocationMap(i + 1, size - i, 2)
+
+
+def countQueries(database: Database, func) -> int:
+    statements = []
+
+    def before(conn, cursor, statement, *args) -> None:
+        statements.append(statement)
+
+    event.listen(database.engine, "before_cursor_execute", before)
+    try:
+        func()
+    finally:
+        event.remove(database.engine, "before_cursor_execute", before)
+    return len(statements)
+
+
+def test_getComponentsQueryCount(tmp_path):
+    counts = []
+    for size in (2, 20):
+        database = Database(f"sqlite:///{tmp_path / f'inventory{size}.db'}")
+        assert database.connect() is True
+        createInventory(database, size)
+        counts.append(countQueries(database, database.getComponents))
+        components = database.getComponents()
+        assert len(components) == size
+        assert all(sum(amount for _, amount in c.locations) == 3 for c in components)
+        assert components[0].locations[0][0].name == "Location 0"
+    assert counts[0] == counts[1]
+
+
+def test_bulkCreate(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'bulk.db'}")
+    assert database.connect() is True
+    assert database.createComponents([Component("A"), Component("B"), Component("A")]) == [True, True, False]
+    assert database.createComponents([Component("B"), Component("C")]) == [False, True]
+    assert database.createLocations([Location("Box"), Location("Bin", parentID=9)]) == [True, False]
+    assert database.createLocations([Location("Drawer", parentID=1), Location("Box")]) == [True, False]
+    assert len(database.getComponents()) == 3
+    assert len(database.getLocations()) == 2
+
+
+def test_setStock(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'stock.db'}")
+    assert database.connect() is True
+    database.createComponents([Component("A"), Component("B")])
+    database.createLocations([Location("Box")])
+    assert database.setStock([(1, 1, 5), (2, 1, 3), (3, 1, 1), (1, 2, 1), (1, 1, -1)]) == [True, True, False, False, False]
+    assert database.getComponentAmountInLocation(1, 1) == 5
+    assert database.setStock([(1, 1, 7), (2, 1, 0)]) == [True, True]
+    assert database.getComponentAmountInLocation(1, 1) == 7
+    assert database.getComponentLocationMap(2, 1) is None
+
+
+def test_adjustStock(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'adjust.db'}")
+    assert database.connect() is True
+    database.createComponents([Component("A")])
+    database.createLocations([Location("Box")])
+    assert database.adjustStock(1, 1, -1) == -1
+    assert database.getComponentLocationMap(1, 1) is None
+    # A change by 0 writes nothing and publishes nothing
+    events = []
+    database.events.subscribe(events.append)
+    assert database.adjustStock(1, 1, 0) == -1
+    assert events == [] and database.getMovements(1) == []
+    assert database.adjustStock(1, 1, 5) == 5
+    assert database.adjustStock(1, 1, 2) == 7
+    assert database.adjustStock(1, 1, -8) == -1
+    assert database.getComponentAmountInLocation(1, 1) == 7
+    assert database.adjustStock(1, 1, -7) == 0
+    assert database.getComponentLocationMap(1, 1) is None
+    assert database.adjustStock(2, 1, 1) == -1
+
+
+def test_performanceProfile(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'fast.db'}", profile="fast", pragmas={"cache_size": -2000})
+    assert database.connect() is True
+    with database.engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1
+        assert conn.exec_driver_sql("PRAGMA cache_size").scalar() == -2000
+        assert conn.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
+    with pytest.raises(ValueError):
+        Database(profile="unknown")
+    with pytest.raises(ValueError):
+        Database(pragmas={"synchronous": "OFF; DROP TABLE components"})
+
+
+def test_transaction(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'transaction.db'}")
+    assert database.connect() is True
+    with database.transaction():
+        assert database.createComponent(Component("A")) is True
+        assert database.createLocation(Location("Box")) is True
+        assert database.createComponentLocationMap(1, 1, 5) is True
+        assert database.addComponentToLocation(1, 1, 2) is True
+        assert database.getComponentAmountInLocation(1, 1) == 7
+        assert database.adjustStock(1, 1, 1) == 8
+        assert database.getComponentAmountInLocation(1, 1) == 8
+    assert database.getComponentAmountInLocation(1, 1) == 8
+
+    with pytest.raises(RuntimeError):
+        with database.transaction():
+            assert database.createComponent(Component("B")) is True
+            assert database.adjustStock(1, 1, -8) == 0
+            raise RuntimeError("Abort")
+    assert database.getComponent(name="B") is None
+    assert database.getComponentAmountInLocation(1, 1) == 8
+
+    # A failing call rolls back the whole unit, later calls fail without running
+    with database.transaction():
+        assert database.createComponent(Component("C")) is True
+        assert database.createComponentLocationMap(1, 9, 1) is False
+        assert database.getComponent(name="A") is None
+        assert database.adjustStock(1, 1, 1) == -1
+        assert database.updateLocation(Location("Renamed", id=1)) is False
+    assert database.getComponent(name="C") is None
+    assert database.getComponentAmountInLocation(1, 1) == 8
+    assert database.getLocation(id=1).name == "Box"
+
+    # A rejected move only takes back itself, the other edits of the unit are kept
+    assert database.createLocation(Location("Drawer")) is True
+    events = []
+    database.events.subscribe(events.append)
+    with database.transaction():
+        assert database.createComponent(Component("D")) is True
+        assert database.moveStock(1, 1, 2, 3) is True
+        assert database.moveStock(1, 1, 2, 6) is False
+        assert database.moveStock(1, 1, 9, 1) is False
+        assert database.getComponentAmountInLocation(1, 1) == 5
+        assert database.adjustStock(1, 2, 1) == 4
+    assert database.getComponent(name="D") is not None
+    assert (database.getComponentAmountInLocation(1, 1), database.getComponentAmountInLocation(1, 2)) == (5, 4)
+    assert [(e.kind, e.locationID) for e in events if e.kind == "stock"] == [("stock", 1), ("stock", 2), ("stock", 2)]
+    assert database.moveStock(1, 1, 2, 6) is False
+    assert database.getComponentAmountInLocation(1, 1) == 5
+
+
+def test_aggregates(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'aggregates.db'}")
+    assert database.connect() is True
+    database.createComponents([Component("A", price=0.5), Component("B", price=2.0), Component("C", price=1.0)])
+    database.createLocations([Location("Box"), Location("Drawer"), Location("Empty")])
+    database.setStock([(1, 1, 4), (1, 2, 6), (2, 2, 3)])
+    assert sorted(database.getComponentTotals()) == [(1, 10, 5.0), (2, 3, 6.0), (3, 0, 0.0)]
+    assert sorted(database.getLocationTotals()) == [(1, 4, 2.0), (2, 9, 9.0), (3, 0, 0.0)]
+    assert database.getInventoryValue() == (13, 11.0)
+    assert database.getAllComponentAmount(1) == 10
+    assert database.getAllComponentAmount(3) == -1
+
+
+def test_ledgerMoves(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'moves.db'}")
+    assert database.connect() is True
+    database.createComponents([Component("A")])
+    database.createLocations([Location("Box"), Location("Drawer")])
+    database.adjustStock(1, 1, 10)
+    assert database.moveStock(1, 1, 2, 4) is True
+    database.adjustStock(1, 2, -1)
+    month = datetime.now(timezone.utc).strftime("%Y-%m")
+    assert [m.kind for m in database.getMovements(1)] == ["adjust", "move", "move", "adjust"]
+    # A move neither adds nor consumes
+    assert database.getConsumptionPerMonth() == [(month, 10, 1)]
+    assert database.compactLedger(datetime(2100, 1, 1)) == 4
+    assert database.getConsumptionPerMonth() == [(month, 10, 1)]
+    assert database.getStockAt(1, datetime(2100, 1, 1), locationID=2) == 3
+
+
+def test_queryComponents(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'query.db'}")
+    assert database.connect() is True
+    database.createComponents([Component(f"Part {i:02}", price=i % 3) for i in range(25)] + [Component("100% cap_x")])
+    database.createLocations([Location("Box")])
+    database.setStock([(i + 1, 1, i % 4) for i in range(25)])
+
+    for sort, key in (("Name", lambda r: (r[0].name, r[0].id)), ("Price", lambda r: (r[0].price, r[0].id)),
+                      ("Quantity", lambda r: (r[1], r[0].id)), ("Total Price", lambda r: (r[2], r[0].id))):
+        rows, cursor = [], None
+        while True:
+            page, cursor = database.queryComponents(sort, after=cursor, limit=7)
+            rows.extend(page)
+            if cursor is None:
+                break
+        assert len(rows) == 26
+        assert [key(r) for r in rows] == sorted(key(r) for r in rows)
+        assert {r[0].name: r[1] for r in rows} == {**{f"Part {i:02}": i % 4 for i in range(25)}, "100% cap_x": 0}
+
+    page, cursor = database.queryComponents("Name", "part 1", limit=20)
+    assert [c.name for c, _, _ in page] == [f"Part {i}" for i in range(10, 20)]
+    assert cursor is None
+    page, _ = database.queryComponents("Name", "100% cap")
+    assert [c.name for c, _, _ in page] == ["100% cap_x"]
+    page, _ = database.queryComponents("Name", "Part 05")
+    assert page[0][0].locations[0][1] == 1
+    # Copies for the list keep the locations for the info panel
+    assert Component("Part 05", locations=page[0][0].locations).locations == page[0][0].locations
+    with pytest.raises(ValueError):
+        database.queryComponents("Color")
+
+
+def test_search(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'search.db'}")
+    assert database.connect() is True
+    database.createComponents([
+        Component("Resistor 10k", description="Metal film 0.25W"),
+        Component("Capacitor 100n", description="Ceramic X7R"),
+        Component("Resistor 4k7", description="Carbon film"),
+    ])
+    database.createLocations([Location("Shelf", shortName="SH", description="Resistors and capacitors")])
+    hits = [(kind, id) for kind, id, _, _ in database.search("resist")]
+    # Name matches rank above description matches
+    assert sorted(hits[:2]) == [("component", 1), ("component", 3)]
+    assert hits[2] == ("location", 1)
+    assert [id for _, id, _, _ in database.search("res film carbon")] == [3]
+    assert [id for _, id, _, _ in database.search("sh", kind="location")] == [1]
+    assert database.search("  ") == []
+    assert database.search('"unbalanced') == []
+
+    component = database.getComponent(3)
+    assert component is not None
+    component.name = "Inductor 10u"
+    assert database.updateComponent(component) is True
+    assert [id for _, id, _, _ in database.search("carbon")] == [3]
+    assert database.search("resistor", kind="component")[0][1] == 1
+    assert len(database.search("resistor", kind="component")) == 1
+    database.deleteComponent(component)
+    assert database.search("inductor") == []
+
+
+def test_cache(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'cache.db'}", cacheSize=2)
+    assert database.connect() is True
+    database.createComponents([Component("A", price=1.0)])
+    database.createLocations([Location("Box"), Location("Drawer"), Location("Shelf")])
+    database.adjustStock(1, 1, 3)
+
+    location = database.getLocation(1)
+    assert database.getLocation(1) is location
+    assert countQueries(database, lambda: database.getLocation(1)) == 0
+    assert database.cache is not None
+    assert database.cache.hits == 2
+
+    component = database.getComponent(1)
+    assert component is not None
+    assert component.locations[0][0] is location
+    assert database.getComponent(1) is component
+    assert database.adjustStock(1, 1, 2) == 5
+    updated = database.getComponent(1)
+    assert updated is not component and updated is not None
+    assert updated.locations[0][1] == 5
+
+    location.name = "Big Box"
+    assert database.updateLocation(location) is True
+    assert database.getLocation(1) is not location
+    assert database.getComponent(1).locations[0][0].name == "Big Box"  # type: ignore
+
+    # Bounded with least recently used eviction
+    database.getLocation(2)
+    database.getLocation(3)
+    assert len(database.cache) == 2
+    misses = database.cache.misses
+    database.getLocation(1)
+    assert database.cache.misses == misses + 1
+
+    # Own commits only invalidate what they changed
+    hits = database.cache.hits
+    assert database.adjustStock(1, 2, 1) == 1
+    assert len(database.cache) == 2
+    database.getLocation(1)
+    database.getLocation(3)
+    assert database.cache.hits == hits + 2
+
+    # Commits of other connections, e.g. another process, clear the cache
+    component = database.getComponent(1)
+    other = Database(f"sqlite:///{tmp_path / 'cache.db'}")
+    assert other.connect() is True
+    assert other.adjustStock(1, 1, 10) == 15
+    assert other.updateLocation(Location("Renamed", id=1)) is True
+    updated = database.getComponent(1)
+    assert updated is not component and updated is not None
+    assert (updated.locations[0][0].name, updated.locations[0][1]) == ("Renamed", 15)
+    assert database.getLocation(1).name == "Renamed"  # type: ignore
+    other.close()
+    database.close()
+    assert database._versionConnection is None
+
+
+def test_events(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'events.db'}")
+    assert database.connect() is True
+    events = []
+    database.events.subscribe(events.append)
+    database.createComponents([Component("A"), Component("B")])
+    database.createLocation(Location("Box"))
+    database.adjustStock(1, 1, 3)
+    database.adjustStock(1, 1, -3)
+    assert [(e.kind, e.action, e.id, e.locationID) for e in events] == [
+        ("component", "created", 1, None),
+        ("component", "created", 2, None),
+        ("location", "created", 1, None),
+        ("stock", "updated", 1, 1),
+        ("stock", "deleted", 1, 1),
+    ]
+    assert database.getComponentTotals([2]) == [(2, 0, 0.0)]
+
+    # Events of a transaction are only published after the commit
+    events.clear()
+    with pytest.raises(RuntimeError):
+        with database.transaction():
+            assert database.createComponent(Component("C")) is True
+            raise RuntimeError("Abort")
+    assert events == []
+    with database.transaction():
+        database.setStock([(2, 1, 4)])
+        assert events == []
+    assert [(e.kind, e.action, e.id, e.locationID) for e in events] == [("stock", "updated", 2, 1)]
+
+    # Subscriber errors don't break the database call
+    database.events.subscribe(lambda event: 1 / 0)
+    assert database.deleteComponent(database.getComponent(2), force=True) is True  # type: ignore
+    assert [(e.kind, e.action, e.id) for e in events[-2:]] == [("stock", "deleted", 2), ("component", "deleted", 2)]
+
+
+def test_locationTree(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'tree.db'}")
+    assert database.connect() is True
+    database.createComponents([Component("A", price=1.0), Component("B", price=0.5)])
+    database.createLocation(Location("Shelf"))
+    database.createLocation(Location("Box", parentID=1))
+    database.createLocation(Location("Drawer", parentID=2))
+    database.createLocation(Location("Bin"))
+    database.setStock([(1, 1, 1), (1, 2, 2), (2, 3, 4), (2, 4, 8)])
+
+    assert [location.name for location in database.getLocationAncestors(3)] == ["Shelf", "Box"]
+    assert database.getLocationAncestors(1) == []
+    assert [location.name for location in database.getLocationDescendants(1)] == ["Box", "Drawer"]
+    assert database.getLocationPath(3) == "Shelf / Box / Drawer"
+    assert database.getLocationPath(9) == ""
+    assert sorted(database.getSubtreeTotals()) == [(1, 7, 5.0), (2, 6, 4.0), (3, 4, 2.0), (4, 8, 4.0)]
+    assert database.getSubtreeTotals([2]) == [(2, 6, 4.0)]
+    # Every call is a single query, however deep the tree
+    assert countQueries(database, lambda: database.getLocationPath(3)) == 1
+    assert countQueries(database, lambda: database.getSubtreeTotals()) == 1
+
+    # A location can't be moved below itself
+    shelf = database.getLocation(1)
+    assert shelf is not None
+    shelf.parentID = 3
+    assert database.updateLocation(shelf) is False
+    shelf.parentID = 1
+    assert database.updateLocation(shelf) is False
+    shelf.parentID = 4
+    assert database.updateLocation(shelf) is True
+    assert database.getLocationPath(3) == "Bin / Shelf / Box / Drawer"
+
+
+def test_stockLedger(tmp_path):
+    database = Database(f"sqlite:///{tmp_path / 'ledger.db'}")
+    assert database.connect() is True
+    database.createComponents([Component("A"), Component("B")])
+    database.createLocations([Location("Box"), Location("Drawer")])
+    database.createComponentLocationMap(1, 1, 10)
+    database.adjustStock(1, 1, -4)
+    database.adjustStock(1, 2, -1)
+    database.setStock([(1, 2, 5), (2, 1, 3)])
+    database.removeComponentFromLocation(1, 1, 6)
+    assert [(m.locationID, m.delta, m.amount) for m in database.getMovements(1)][::-1] == [
+        (1, 10, 10), (1, -4, 6), (2, 5, 5), (1, -6, 0)
+    ]
+
+    # Spread the movements over three months
+    with database.engine.begin() as conn:
+        for id, timestamp in enumerate(["2026-01-05", "2026-01-20", "2026-02-02", "2026-01-10", "2026-03-01"], start=1):
+            conn.exec_driver_sql(f"UPDATE stockmovements SET timestamp = '{timestamp} 12:00:00.000' WHERE id = {id}")
+    assert database.getStockAt(1, datetime(2026, 1, 31)) == 6
+    assert database.getStockAt(1, datetime(2026, 2, 15), locationID=2) == 5
+    monthly = [("2026-01", 13, 4), ("2026-02", 5, 0), ("2026-03", 0, 6)]
+    assert database.getConsumptionPerMonth() == monthly
+    assert database.getConsumptionPerMonth(componentID=1, since=datetime(2026, 2, 1)) == [("2026-02", 5, 0), ("2026-03", 0, 6)]
+
+    # Folding keeps the answers, at month resolution for the folded months
+    assert database.compactLedger(datetime(2026, 3, 1)) == 4
+    assert len(database.getMovements(1)) == 1
+    assert database.getConsumptionPerMonth() == monthly
+    assert database.getStockAt(1, datetime(2026, 2, 15)) == 6
+    assert database.getStockAt(1, datetime(2026, 3, 2)) == 5
+    assert database.getStockAt(2, datetime(2026, 3, 2)) == 3
+    assert database.compactLedger(datetime(2026, 3, 1)) == 0
+
+    # Movements written late into folded months are added to their snapshots and the later ones
+    database.adjustStock(1, 1, 2)
+    database.adjustStock(1, 1, -1)
+    with database.engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE stockmovements SET timestamp = '2025-12-24 12:00:00.000' WHERE id = 6")
+        conn.exec_driver_sql("UPDATE stockmovements SET timestamp = '2026-01-25 12:00:00.000' WHERE id = 7")
+    assert database.compactLedger(datetime(2026, 3, 1)) == 2
+    assert database.getConsumptionPerMonth(componentID=1) == [("2025-12", 2, 0), ("2026-01", 10, 5), ("2026-02", 5, 0), ("2026-03", 0, 6)]
+    assert database.getStockAt(1, datetime(2026, 1, 15), locationID=1) == 2
+    assert database.getStockAt(1, datetime(2026, 2, 15), locationID=1) == 7
+    assert database.getStockAt(1, datetime(2026, 3, 2)) == 6
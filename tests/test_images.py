@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+
+from PIL import Image
+
+from src import images
+from src.component import Component
+from src.database import Database
+
+
+def test_lazyImages(tmp_path, monkeypatch):
+    path = tmp_path / "part.png"
+    Image.new("RGB", (300, 200), "red").save(path)
+    db = Database(f"sqlite:///{tmp_path / 'images.db'}", profile="fast")
+    assert db.connect() is True
+    db.createComponents([Component(f"Part {i}", imagePath=path) for i in range(100)])
+    assert db.getImagePaths() == [str(path)]
+    images.imageCache.clear()
+    opened = []
+    monkeypatch.setattr(Image, "open", lambda *args, **kwargs: opened.append(args) or Image.new("RGB", (300, 200)))
+
+    components = db.getComponents()
+    assert len(components) == 100 and opened == []
+    # Copies share one decoded image
+    assert components[0].image is not None and components[0].image.size == images.THUMBNAIL_SIZE
+    assert all(component.image is components[0].image for component in components)
+    assert len(opened) == 1
+
+    # A replaced file is decoded again
+    os.utime(path, ns=(0, 0))
+    assert Component("Part", imagePath=path).image is not components[0].image
+    assert len(opened) == 2
+    assert Component("Missing", imagePath=tmp_path / "missing.png").image is None
+
+
+def test_thumbnailCache(tmp_path, monkeypatch):
+    photo = tmp_path / "photo.jpg"
+    Image.new("RGB", (2000, 1500), "blue").save(photo)
+    copy = tmp_path / "copy.jpg"
+    copy.write_bytes(photo.read_bytes())
+    cache = images.ThumbnailCache(tmp_path / "thumbnails")
+
+    digest = cache.render(photo)
+    assert cache.render(copy) == digest
+    files = sorted(path.name for path in (tmp_path / "thumbnails").rglob("*.png"))
+    assert files == [f"{digest}-{size}.png" for size in (100, 128, 64)]
+    with Image.open(cache.thumbnailPath(photo, 64)) as thumbnail:
+        assert thumbnail.size == (64, 64)
+
+    # The index survives a restart, unchanged originals are not read again
+    with monkeypatch.context() as patch:
+        patch.setattr(images, "hashFile", None)
+        patch.setattr(images, "decodeImage", None)
+        assert images.ThumbnailCache(tmp_path / "thumbnails").render(photo) == digest
+
+    Image.new("RGB", (400, 300), "green").save(photo)
+    assert cache.render(photo) != digest
+    assert cache.evict() == 0
+    copy.unlink()
+    assert cache.evict() == 3
+    assert len(list((tmp_path / "thumbnails").rglob("*.png"))) == 3
+
+    # Nothing is evicted while a render is in flight, its files are not in the index yet
+    other = tmp_path / "other.png"
+    Image.new("RGB", (300, 300), "red").save(other)
+    started, release = threading.Event(), threading.Event()
+    renderFiles = images.renderFiles
+
+    def slowRender(*args):
+        result = renderFiles(*args)
+        started.set()
+        release.wait(5)
+        return result
+
+    monkeypatch.setattr(images, "renderFiles", slowRender)
+    thread = threading.Thread(target=cache.render, args=(other,))
+    thread.start()
+    assert started.wait(5)
+    assert cache.evict() == 0
+    release.set()
+    thread.join()
+    assert len(list((tmp_path / "thumbnails").rglob("*.png"))) == 6
+
+    # Only stale leftovers of interrupted writes are removed
+    fresh, stale = tmp_path / "thumbnails" / "ab" / "fresh.tmp", tmp_path / "thumbnails" / "ab" / "stale.tmp"
+    fresh.parent.mkdir(exist_ok=True)
+    fresh.write_bytes(b"")
+    stale.write_bytes(b"")
+    old = time.time() - images.STALE_TEMP_AGE - 1
+    os.utime(stale, (old, old))
+    assert cache.evict() == 1
+    assert fresh.exists() and not stale.exists()
+
+
+def test_loadThumbnail(tmp_path):
+    photo = tmp_path / "photo.jpg"
+    Image.new("RGB", (800, 600), "blue").save(photo)
+    images.useThumbnailCache(tmp_path / "thumbnails")
+    try:
+        component = Component("Part", imagePath=photo)
+        assert component.image is not None and component.image.size == (128, 128)
+        assert component.thumbnail(64).size == (64, 64)
+        assert component.thumbnail(32).size == (32, 32)
+        assert len(list((tmp_path / "thumbnails").rglob("*.png"))) == 3
+    finally:
+        images.useThumbnailCache(None)
+
+
+def test_renderMany(tmp_path):
+    paths = []
+    for i in range(6):
+        paths.append(tmp_path / f"photo{i}.jpg")
+        Image.new("RGB", (600, 400), (i * 40, 0, 0)).save(paths[-1])
+    broken = tmp_path / "broken.jpg"
+    broken.write_bytes(b"not an image")
+    cache = images.ThumbnailCache(tmp_path / "thumbnails")
+    assert cache.cachedPath(paths[0], 64) is None
+
+    steps = []
+    results = dict(cache.renderMany([*paths, broken, paths[0]], workers=2, progress=lambda done, total: steps.append((done, total))))
+    assert results[str(broken)] is None and len(results) == 7
+    assert steps[-1] == (7, 7)
+    assert all(cache.cachedPath(path, 64) is not None for path in paths)
+    assert len(list((tmp_path / "thumbnails").rglob("*.png"))) == 18
+
+    # Rendered images are read from the index by a new cache, processes render the rest
+    Image.new("RGB", (600, 400), "white").save(paths[0])
+    cache = images.ThumbnailCache(tmp_path / "thumbnails")
+    results = dict(cache.renderMany(paths, workers=2, processes=True))
+    assert results[str(paths[0])] == images.hashFile(paths[0])
+    assert cache.cachedPath(paths[0], 128) is not None
@@ -0,0 +1,86 @@
+import gzip
+import json
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from src.component import Component
+from src.database import Database
+from src.exporter import exportComponents, exportLocations, exportStock
+from src.importer import chunked, importComponents, importLocations, importStock
+from src.location import Location
+
+
+def test_chunked():
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+def test_import(tmp_path):
+    db = Database(f"sqlite:///{tmp_path / 'import.db'}")
+    assert db.connect() is True
+
+    components = tmp_path / "components.csv"
+    components.write_text("name,description,price\n" + "".join(f"R{i},Resistor,0.1\n" for i in range(25)) + "R0,,0.2\n")
+    assert importComponents(db, components, chunkSize=10) == (25, 1)
+
+    locations = tmp_path / "locations.jsonl"
+    locations.write_text("\n".join(json.dumps({"name": f"Box {i}", "shortName": f"B{i}"}) for i in range(3)))
+    assert importLocations(db, locations) == (3, 0)
+
+    stock = tmp_path / "stock.csv"
+    stock.write_text("componentID,locationID,amount\n1,1,10\n2,3,4\n99,1,1\n")
+    assert importStock(db, stock) == (2, 1)
+    assert db.getComponentAmountInLocation(2, 3) == 4
+
+
+def test_export(tmp_path):
+    db = Database(f"sqlite:///{tmp_path / 'export.db'}")
+    assert db.connect() is True
+    db.createComponents([Component("X")] + [Component(f"R{i}", description="Résistor", price=0.1) for i in range(5)])
+    db.createLocations([Location("Shelf")])
+    db.createLocations([Location("Box", parentID=1)])
+    db.setStock([(i + 2, 2, i + 1) for i in range(5)])
+
+    assert exportComponents(db, tmp_path / "components.csv.gz", columns=["name", "price"]) == 6
+    with gzip.open(tmp_path / "components.csv.gz", "rt", encoding="utf-8") as f:
+        assert f.readline().strip() == "name,price"
+    assert exportStock(db, tmp_path / "stock.jsonl") == 5
+    assert json.loads((tmp_path / "stock.jsonl").read_text().splitlines()[2]) == {
+        "componentID": 4, "component": "R2", "locationID": 2, "location": "Box", "amount": 3
+    }
+    with pytest.raises(ValueError):
+        exportLocations(db, tmp_path / "locations.csv", columns=["price"])
+
+    # Exported files import into a new database whose IDs differ
+    assert db.deleteComponent(db.getComponent(name="X")) is True  # type: ignore
+    assert exportComponents(db, tmp_path / "components.csv") == 5
+    assert exportLocations(db, tmp_path / "locations.jsonl") == 2
+    copy = Database(f"sqlite:///{tmp_path / 'copy.db'}")
+    assert copy.connect() is True
+    copy.createLocations([Location("Drawer")])
+    assert importComponents(copy, tmp_path / "components.csv") == (5, 0)
+    assert importLocations(copy, tmp_path / "locations.jsonl", chunkSize=1) == (2, 0)
+    assert importStock(copy, tmp_path / "stock.jsonl") == (5, 0)
+    assert copy.getComponent(name="R4").description == "Résistor"  # type: ignore
+    assert copy.getLocation(name="Box").parentID == copy.getLocation(name="Shelf").id  # type: ignore
+    assert [(location.name, amount) for location, amount in copy.getComponent(name="R1").locations] == [("Box", 2)]  # type: ignore
+    assert copy.getInventoryValue()[0] == 15
+
+
+def test_exportFailure(tmp_path, monkeypatch):
+    db = Database(f"sqlite:///{tmp_path / 'export.db'}")
+    assert db.connect() is True
+    db.createComponents([Component(f"R{i}") for i in range(5)])
+    target = tmp_path / "components.csv"
+    target.write_text("old")
+
+    def failing(*args, **kwargs):
+        yield {"id": 1, "name": "R0"}
+        raise OperationalError("SELECT", None, Exception("disk I/O error"))
+
+    monkeypatch.setattr(db, "streamRows", failing)
+    with pytest.raises(OperationalError):
+        exportComponents(db, target)
+    # A failed export keeps the old file and leaves no partial file
+    assert target.read_text() == "old"
+    assert [path.name for path in tmp_path.iterdir() if path.name.startswith("components")] == ["components.csv"]
@@ -0,0 +1,81 @@
+import logging
+import sqlite3
+
+from src.database import Database
+from src.migrations import SCHEMA_VERSION
+
+
+LEGACY_SCHEMA = """
+CREATE TABLE components (id INTEGER NOT NULL, name VARCHAR NOT NULL, description VARCHAR, price FLOAT NOT NULL,
+    "imagePath" VARCHAR, "datasheetPath" VARCHAR, PRIMARY KEY (id));
+CREATE TABLE locations (id INTEGER NOT NULL, "parentID" INTEGER NOT NULL, name VARCHAR NOT NULL,
+    "shortName" VARCHAR NOT NULL, description VARCHAR NOT NULL, PRIMARY KEY (id));
+CREATE TABLE componentlocationmap (id INTEGER NOT NULL, "componentID" INTEGER NOT NULL, amount INTEGER NOT NULL,
+    "locationID" INTEGER NOT NULL, PRIMARY KEY (id));
+INSERT INTO components VALUES (1, 'R1', '', 0.1, NULL, NULL);
+INSERT INTO locations VALUES (1, -1, 'Box', 'B', '');
+INSERT INTO componentlocationmap VALUES (1, 1, 5, 1);
+INSERT INTO componentlocationmap VALUES (2, 1, 3, 1);
+INSERT INTO componentlocationmap VALUES (3, 2, 7, 1);
+"""
+
+
+def getIndexes(path, table: str) -> dict[str, bool]:
+    with sqlite3.connect(path) as conn:
+        return {row[1]: bool(row[2]) for row in conn.execute(f"PRAGMA index_list({table})")}
+
+
+def test_freshDatabase(tmp_path):
+    path = tmp_path / "fresh.db"
+    db = Database(f"sqlite:///{path}")
+    assert db.connect() is True
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert getIndexes(path, "componentlocationmap")["ix_componentlocationmap_componentID_locationID"] is True
+
+
+def test_upgradeLegacyDatabase(tmp_path, caplog):
+    path = tmp_path / "legacy.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(LEGACY_SCHEMA)
+
+    db = Database(f"sqlite:///{path}")
+    with caplog.at_level(logging.WARNING, logger="src.migrations"):
+        assert db.connect() is True
+    # The lost and merged stock is reported
+    warnings = [record.getMessage() for record in caplog.records if record.name == "src.migrations"]
+    assert any("Dropping 1 stock rows with a total amount of 7" in warning for warning in warnings)
+    assert any("Merging 1 duplicate stock rows" in warning for warning in warnings)
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        foreignKeys = {row[3]: row[2] for row in conn.execute("PRAGMA foreign_key_list(componentlocationmap)")}
+        assert foreignKeys == {"componentID": "components", "locationID": "locations"}
+    assert "ix_components_name" in getIndexes(path, "components")
+    assert "ix_locations_name" in getIndexes(path, "locations")
+    assert getIndexes(path, "componentlocationmap")["ix_componentlocationmap_componentID_locationID"] is True
+    # Duplicates are merged and the orphaned row is dropped
+    assert db.getComponentAmountInLocation(1, 1) == 8
+    assert db.getComponentLocationMap(2, 1) is None
+    # The existing stock is the opening balance of the ledger
+    assert [(m.locationID, m.delta) for m in db.getMovements(1)] == [(1, 8)]
+    # Connecting again doesn't change anything
+    assert db.connect() is True
+    assert db.getComponentAmountInLocation(1, 1) == 8
+
+
+def test_foreignKeysEnforced(tmp_path):
+    db = Database(f"sqlite:///{tmp_path / 'fk.db'}")
+    assert db.connect() is True
+    assert db.createComponentLocationMap(1, 1, 5) is False
+
+
+def test_addMovementKind(tmp_path):
+    path = tmp_path / "ledger.db"
+    db = Database(f"sqlite:///{path}")
+    assert db.connect() is True
+    with sqlite3.connect(path) as conn:
+        conn.execute("INSERT INTO stockmovements (\"componentID\", \"locationID\", delta, amount, timestamp) VALUES (1, 1, 5, 5, '2026-01-01')")
+        conn.execute("ALTER TABLE stockmovements DROP COLUMN kind")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION - 1}")
+    assert db.connect() is True
+    assert [m.kind for m in db.getMovements(1)] == ["adjust"]
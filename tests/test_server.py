@@ -0,0 +1,133 @@
+import http.client
+import threading
+import time
+
+import pytest
+
+from src.client import RemoteDatabase, RemoteError, openDatabase
+from src.component import Component
+from src.database import Database
+from src.location import Location
+from src.server import InventoryServer, RequestHandler
+
+
+@pytest.fixture
+def remote(tmp_path):
+    db = Database(f"sqlite:///{tmp_path / 'server.db'}")
+    assert db.connect() is True
+    server = InventoryServer(db, ("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = RemoteDatabase(f"http://127.0.0.1:{server.server_port}")
+    yield client
+    client.close()
+    server.close()
+
+
+def test_remoteDatabase(remote):
+    assert remote.connect() is True
+    events = []
+    remote.events.subscribe(events.append)
+    assert remote.createComponents([Component("R1", price=0.1), Component("R2", price=0.2)]) == [True, True]
+    assert remote.createLocation(Location("Box", shortName="B")) is True
+    assert remote.adjustStock(1, 1, 5) == 5
+    assert [(e.kind, e.action, e.id) for e in events][-1] == ("stock", "updated", 1)
+
+    component = remote.getComponent(id=1)
+    assert component.name == "R1"
+    assert component.locations[0][0].shortName == "B" and component.locations[0][1] == 5
+    page, cursor = remote.queryComponents("Name", limit=1)
+    assert [c.name for c, _, _ in page] == ["R1"] and isinstance(cursor, tuple)
+    assert [c.name for c, _, _ in remote.queryComponents("Name", after=cursor)[0]] == ["R2"]
+
+    # One request for a whole refresh, unchanged results are revalidated with the ETag
+    calls = [("getLocations", (), {}), ("getLocationTotals", (), {}), ("getInventoryValue", (), {})]
+    locations, totals, value = remote.batch(calls)
+    assert [location.name for location in locations] == ["Box"] and totals == [(1, 5, 0.5)] and value == (5, 0.5)
+    assert remote.batch(calls)[2] == (5, 0.5)
+    assert remote.notModified == 1
+    remote.adjustStock(1, 1, 1)
+    assert remote.batch(calls)[2] == (6, pytest.approx(0.6))
+    assert remote.notModified == 1
+    # All requests went over one kept alive connection
+    assert remote.connections == 1
+
+    # A failed call rolls back the whole batch
+    calls = [("adjustStock", (1, 1, 1), {}), ("createComponentLocationMap", (1, 9, 1), {}), ("adjustStock", (1, 1, 1), {})]
+    assert remote.batch(calls, transaction=True)[1:] == [False, -1]
+    assert remote.getComponentAmountInLocation(1, 1) == 6
+
+    # Writes in a transaction are sent as one batch when the block ends
+    with remote.transaction() as results:
+        assert remote.adjustStock(1, 1, 2) is None
+        assert remote.getComponentAmountInLocation(1, 1) == 6
+        remote.adjustStock(1, 1, 1)
+    assert results == [8, 9] and remote.getComponentAmountInLocation(1, 1) == 9
+    with pytest.raises(ValueError):
+        with remote.transaction():
+            remote.adjustStock(1, 1, 1)
+            raise ValueError()
+    assert remote.getComponentAmountInLocation(1, 1) == 9
+    with pytest.raises(RemoteError):
+        remote.call("dispose")
+    with pytest.raises(AttributeError):
+        remote.engine
+
+
+def test_staleConnection(remote, monkeypatch):
+    # The server closes idle kept alive connections, a write must not be sent on such a socket
+    monkeypatch.setattr(RequestHandler, "timeout", 0.1)
+    assert remote.createComponent(Component("R1")) is True
+    assert remote.createLocation(Location("Box")) is True
+    time.sleep(0.3)
+    assert remote.adjustStock(1, 1, 5) == 5
+    assert remote.connections == 2
+    assert remote.getComponentAmountInLocation(1, 1) == 5
+
+    # A write that was sent but got no response is not sent again
+    getresponse = http.client.HTTPConnection.getresponse
+
+    def disconnect(conn):
+        monkeypatch.setattr(http.client.HTTPConnection, "getresponse", getresponse)
+        raise http.client.RemoteDisconnected()
+
+    monkeypatch.setattr(http.client.HTTPConnection, "getresponse", disconnect)
+    with pytest.raises(RemoteError):
+        remote.adjustStock(1, 1, 5)
+    time.sleep(0.1)
+    assert remote.getComponentAmountInLocation(1, 1) == 10
+
+
+def test_outOfBandWrite(tmp_path, remote):
+    # A commit that publishes no event on the server, here by another process, changes the ETag
+    assert remote.createComponent(Component("R1")) is True
+    assert [component.name for component in remote.getComponents()] == ["R1"]
+    other = Database(f"sqlite:///{tmp_path / 'server.db'}")
+    assert other.connect() is True
+    assert other.createComponent(Component("R2")) is True
+    assert [component.name for component in remote.getComponents()] == ["R1", "R2"]
+    assert [component.name for component in remote.getComponents()] == ["R1", "R2"]
+    assert remote.notModified == 1
+
+
+def test_token(tmp_path):
+    db = Database(f"sqlite:///{tmp_path / 'server.db'}")
+    assert db.connect() is True
+    server = InventoryServer(db, ("127.0.0.1", 0), token="secret")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    try:
+        assert RemoteDatabase(url, token="secret").createComponent(Component("R1")) is True
+        for client in (RemoteDatabase(url), RemoteDatabase(url, token="wrong")):
+            assert client.connect() is False
+            with pytest.raises(RemoteError):
+                client.createComponent(Component("R2"))
+        assert [component.name for component in db.getComponents()] == ["R1"]
+    finally:
+        server.close()
+
+
+def test_openDatabase():
+    assert isinstance(openDatabase({"database": {"url": "http://127.0.0.1:8750"}}), RemoteDatabase)
+    assert openDatabase({"database": {"url": "http://127.0.0.1:8750", "token": "secret"}}).token == "secret"
+    assert isinstance(openDatabase({"database": {"url": "sqlite://"}}), Database)
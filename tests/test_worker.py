@@ -0,0 +1,83 @@
+import threading
+import time
+
+from src.component import Component
+from src.database import Database
+from src.worker import DatabaseWorker
+
+
+class FakeWidget:
+    """Stands in for a Tk widget, runs the after callbacks on the calling thread."""
+
+    def __init__(self) -> None:
+        self.callbacks = []
+        self.exists = True
+
+    def after(self, ms, func) -> None:
+        self.callbacks.append(func)
+
+    def winfo_exists(self) -> bool:
+        return self.exists
+
+    def runUntilIdle(self, timeout: float = 5.0) -> None:
+        end = time.monotonic() + timeout
+        while self.callbacks and time.monotonic() < end:
+            self.callbacks.pop(0)()
+            time.sleep(0.001)
+
+
+def test_worker(tmp_path):
+    db = Database(f"sqlite:///{tmp_path / 'worker.db'}")
+    assert db.connect() is True
+    worker = DatabaseWorker(db)
+    try:
+        assert worker.submit("createComponent", Component("A")).result(timeout=5) is True
+        widget = FakeWidget()
+        results = []
+        worker.run(widget, db.getComponent, name="A", callback=results.append)
+        widget.runUntilIdle()
+        assert [component.name for component in results] == ["A"]
+        assert threading.current_thread() is threading.main_thread()
+    finally:
+        worker.shutdown()
+
+
+def test_staleRequests(tmp_path):
+    db = Database(f"sqlite:///{tmp_path / 'stale.db'}")
+    assert db.connect() is True
+    worker = DatabaseWorker(db)
+    release = threading.Event()
+    try:
+        running = worker.submit(release.wait, key="search")
+        pending = worker.submit(db.search, "a", key="search")
+        latest = worker.submit(db.search, "b", key="search")
+        assert pending.cancelled()
+        widget = FakeWidget()
+        results = []
+        worker.deliver(widget, running, results.append, key="search")
+        worker.deliver(widget, latest, results.append, key="search")
+        release.set()
+        widget.runUntilIdle()
+        # Only the newest request reaches the callback
+        assert results == [[]]
+        assert worker.isStale(running, "search") is True
+        assert worker.isStale(latest, "search") is False
+    finally:
+        release.set()
+        worker.shutdown()
+
+
+def test_destroyedWidget(tmp_path):
+    db = Database(f"sqlite:///{tmp_path / 'destroyed.db'}")
+    assert db.connect() is True
+    worker = DatabaseWorker(db)
+    try:
+        widget = FakeWidget()
+        results = []
+        future = worker.run(widget, db.getLocations, callback=results.append)
+        future.result(timeout=5)
+        widget.exists = False
+        widget.runUntilIdle()
+        assert results == []
+    finally:
+        worker.shutdown()